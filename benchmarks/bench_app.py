@@ -0,0 +1,202 @@
+"""Offline-Benchmark der App-Datenpfade gegen lokale Stellvertreter (siehe fakes.py).
+
+Gemessen wird pro Bibliotheksgröße:
+  load_cold / load_warm      load_library wie load_data_from_github (Download+Einlesen / 304+Snapshot)
+  matcher_build / match_many LibraryMatcher aufbauen, 300 TMDB-Titel gegen die Bibliothek
+  index_build / index_search LibrarySearchIndex aufbauen, 20 Suchanfragen der Lokalen Liste
+  status_push                update_db_status-Pfad: LocalStore.apply + SheetSync.push (zeilenweise)
+  status_rewrite             alter Pfad: ganzes Blatt lesen, ändern und komplett hochladen
+  app_cold_start             erster Durchlauf der App (AppTest) mit leerem Cache-Ordner
+  app_rerun                  zweiter Durchlauf derselben Session
+  app_search                 Suche "Matrix" inkl. TMDB, Abgleich mit der Bibliothek und Postern
+  app_update_status          Klick auf "Wunschliste" in den Suchergebnissen (update_db_status + Rerun)
+
+Jede Größe läuft in einem eigenen Prozess (frische Caches, keine Hintergrund-Threads vom Vorgänger).
+Ergebnisse landen in benchmarks/results/; mit --baseline wird gegen einen gespeicherten Stand
+verglichen und bei Verschlechterung über --threshold mit Exit-Code 1 beendet.
+
+Aufruf (aus dem Repo-Ordner):
+  python benchmarks/bench_app.py                       # 1k, 10k, 100k Zeilen
+  python benchmarks/bench_app.py --sizes 1000,10000 --save-baseline
+  python benchmarks/bench_app.py --sizes 1000,10000 --baseline benchmarks/results/baseline.json
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.dirname(HERE)
+RESULTS_DIR = os.path.join(HERE, "results")
+sys.path.insert(0, REPO)
+
+SEARCH_QUERIES = ["krimi", "liebe", "actor:hanks", "genre:komödie", "type:serie", "der", "schw", "berlin",
+                  "mord", "familie", "genre:drama liebe", "weihnacht", "agent", "year:1999", "krieg", "hund",
+                  "ddr", "doktor", "stadt", "nacht"]
+MIN_DELTA = 0.010  # Unterschiede unter 10 ms zählen nie als Verschlechterung
+
+def timed(fn, rounds=1):
+    """Median der Laufzeiten (Sekunden) und das Ergebnis des letzten Aufrufs."""
+    times, result = [], None
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times), result
+
+def typo(title, rng):
+    # Leichte Abwandlung wie bei TMDB-Titeln: Groß/klein, Satzzeichen, ein vertauschter Buchstabe
+    t = title.lower().replace(":", "").replace("-", " ")
+    if len(t) > 6 and rng.random() < 0.5:
+        i = rng.randrange(1, len(t) - 2)
+        t = t[:i] + t[i + 1] + t[i] + t[i + 2:]
+    return t
+
+# --- EINE GRÖSSE (Kindprozess) ---
+def bench_size(rows, rounds, tmdb_latency, sheet_latency, sheet_rows_n):
+    from streamlit.testing.v1 import AppTest
+    import streamlit_gsheets
+    import fakes
+    from couchpilot_library import SnapshotStore, load_library, LibraryMatcher, LibrarySearchIndex
+    from couchpilot_tmdb import make_session
+    from couchpilot_db import SheetDB, GspreadSheet, LocalStore, SheetSync, apply_status_to_frame, frame_from_rows, rows_from_frame
+
+    out = {}
+    work = tempfile.mkdtemp(prefix=f"couchpilot_bench_{rows}_")
+    files = fakes.LibraryFileServer().start()
+    tmdb = fakes.FakeTmdbServer(latency=tmdb_latency).start()
+    files.prepare(rows)
+    urls = [f"{files.base_url(rows)}{name}" for name in fakes.LIBRARY_FILES]
+
+    # Bibliothek laden (= load_data_from_github ohne st.cache_data)
+    store = SnapshotStore(os.path.join(work, "lib_snapshots"))
+    session = make_session()
+    out["load_cold"], library = timed(lambda: load_library(urls, {}, store, session))
+    errors = [r["error"] for r in library.load_report if r["error"]]
+    if errors: raise RuntimeError(f"Bibliothek nicht geladen: {errors}")
+    out["load_warm"], _ = timed(lambda: load_library(urls, {}, store, session), rounds)
+
+    # Fuzzy-Abgleich und Volltextsuche
+    rng = random.Random(rows)
+    titles = [typo(t, rng) for t in rng.sample(list(library.df["title"]), min(200, len(library)))]
+    for media in ("movie", "tv"):
+        titles += [t.get("title") or t.get("name") for t in tmdb.templates[media]]
+    titles += [f"Unbekannter Film {i}" for i in range(300 - len(titles))]
+    out["matcher_build"], matcher = timed(lambda: LibraryMatcher(library), rounds)
+    out["match_many"], _ = timed(lambda: matcher.match_many(titles), rounds)
+    out["index_build"], index = timed(lambda: LibrarySearchIndex(library.df), rounds)
+    out["index_search"], _ = timed(lambda: [index.search(q) for q in SEARCH_QUERIES], rounds)
+
+    # Statusänderung: neuer Pfad (lokal + zeilenweise) gegen den alten (ganzes Blatt)
+    base_rows = fakes.sheet_rows(sheet_rows_n)
+    movies = [{"id": 30_000_000 + i, "title": f"Neu {i}", "poster_path": "", "vote_average": 7.0} for i in range(20)]
+    local = LocalStore(os.path.join(work, "watchlist.sqlite"))
+    ws = fakes.MemoryWorksheet(base_rows, sheet_latency)
+    sync = SheetSync(local, SheetDB(GspreadSheet(ws)))
+    sync.sync()
+
+    def _push():
+        for m in movies: local.apply(m, "watchlist", "Benchmark")
+        sync.push()
+    out["status_push"], _ = timed(_push)
+    out["status_push_calls"] = ws.calls
+
+    legacy = fakes.MemoryWorksheet(base_rows, sheet_latency)
+    def _rewrite():
+        for m in movies:
+            df = apply_status_to_frame(frame_from_rows(legacy.get_all_values()), m, "watchlist", "Benchmark")
+            legacy.update(rows_from_frame(df))
+    out["status_rewrite"], _ = timed(_rewrite)
+
+    # Die App selbst, gegen die lokalen Server
+    fakes.FakeGSheetsConnection.rows = base_rows
+    fakes.FakeGSheetsConnection.latency = sheet_latency
+    streamlit_gsheets.GSheetsConnection = fakes.FakeGSheetsConnection
+    os.environ.update({"COUCHPILOT_CACHE_DIR": os.path.join(work, "app_cache"),
+                       "COUCHPILOT_TMDB_BASE_URL": tmdb.base_url,
+                       "COUCHPILOT_IMAGE_BASE_URL": tmdb.image_base_url,
+                       "COUCHPILOT_LIBRARY_BASE_URL": files.base_url(rows)})
+    at = AppTest.from_file(os.path.join(REPO, "couchpilot_cloud.py"), default_timeout=600)
+    at.secrets["TMDB_API_KEY"] = "benchmark"
+
+    def _run(step):
+        step()
+        if at.exception: raise RuntimeError(at.exception[0].value)
+    out["app_cold_start"], _ = timed(lambda: _run(at.run))
+    out["app_rerun"], _ = timed(lambda: _run(at.run), rounds)
+    out["app_search"], _ = timed(lambda: _run(lambda: at.text_input[0].set_value("Matrix").run()))
+    out["app_update_status"], _ = timed(lambda: _run(lambda: at.button(key="src_wl_603").click().run()))
+    out["tmdb_requests"] = tmdb.requests
+    return out  # Server laufen als Daemon-Threads bis zum Prozessende weiter (Hintergrund-Threads der App)
+
+# --- AUSWERTUNG ---
+def compare(current, baseline, threshold):
+    """Liefert Zeilen (name, alt, neu, faktor, verschlechtert) für alle Zeitmessungen beider Läufe."""
+    rows = []
+    for key, new in current.items():
+        old = baseline.get(key)
+        if old is None or not isinstance(new, float): continue  # Zähler (Aufrufe, Anfragen) nur zur Info
+        factor = new / old if old else float("inf")
+        rows.append((key, old, new, factor, factor > 1 + threshold and new - old > MIN_DELTA))
+    return rows
+
+def flatten(results):
+    return {f"{name}@{size}": value for size, values in results.items() for name, value in values.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Bibliotheksgrößen (Zeilen), kommagetrennt")
+    parser.add_argument("--rounds", type=int, default=3, help="Wiederholungen für die wiederholbaren Messungen (Median)")
+    parser.add_argument("--tmdb-latency", type=float, default=0.02, help="künstliche TMDB-Antwortzeit in Sekunden")
+    parser.add_argument("--sheet-latency", type=float, default=0.05, help="künstliche Dauer je Sheets-API-Aufruf")
+    parser.add_argument("--sheet-rows", type=int, default=2000, help="Einträge in der Datenbank-Tabelle")
+    parser.add_argument("--baseline", help="Vergleich mit diesem Ergebnis (JSON)")
+    parser.add_argument("--threshold", type=float, default=0.25, help="erlaubte Verschlechterung (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Ergebnis als {RESULTS_DIR}/baseline.json ablegen")
+    parser.add_argument("--one", type=int, help=argparse.SUPPRESS)  # intern: eine Größe im Kindprozess
+    args = parser.parse_args()
+
+    if args.one:
+        result = bench_size(args.one, args.rounds, args.tmdb_latency, args.sheet_latency, args.sheet_rows)
+        print("RESULT " + json.dumps(result))
+        return 0
+
+    results = {}
+    for size in [int(s) for s in args.sizes.split(",")]:
+        print(f"== {size} Zeilen ==", flush=True)
+        cmd = [sys.executable, os.path.abspath(__file__), "--one", str(size), "--rounds", str(args.rounds),
+               "--tmdb-latency", str(args.tmdb_latency), "--sheet-latency", str(args.sheet_latency),
+               "--sheet-rows", str(args.sheet_rows)]
+        proc = subprocess.run(cmd, capture_output=True, text=True, cwd=HERE)
+        line = next((l for l in proc.stdout.splitlines() if l.startswith("RESULT ")), None)
+        if proc.returncode or line is None:
+            print(proc.stdout[-2000:], proc.stderr[-4000:], sep="\n")
+            return 2
+        results[size] = json.loads(line[len("RESULT "):])
+        for name, value in results[size].items():
+            print(f"  {name:<20} {value * 1000:10.1f} ms" if isinstance(value, float) else f"  {name:<20} {value:10d}")
+
+    run = {"t": time.time(), "python": sys.version.split()[0], "args": vars(args), "results": flatten(results)}
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    with open(os.path.join(RESULTS_DIR, "history.jsonl"), "a", encoding="utf-8") as f: f.write(json.dumps(run) + "\n")
+    if args.save_baseline:
+        with open(os.path.join(RESULTS_DIR, "baseline.json"), "w", encoding="utf-8") as f: json.dump(run, f, indent=1)
+        print(f"Baseline gespeichert: {RESULTS_DIR}/baseline.json")
+    if not args.baseline: return 0
+
+    with open(args.baseline, encoding="utf-8") as f: baseline = json.load(f)["results"]
+    rows = compare(run["results"], baseline, args.threshold)
+    print(f"\nVergleich mit {args.baseline} (Schwelle +{args.threshold:.0%}):")
+    for key, old, new, factor, worse in rows:
+        print(f"  {'❌' if worse else '  '} {key:<28} {old * 1000:9.1f} -> {new * 1000:9.1f} ms  ({factor:5.2f}x)")
+    worse = [r[0] for r in rows if r[4]]
+    if worse: print(f"\n{len(worse)} Verschlechterung(en): {', '.join(worse)}")
+    return 1 if worse else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
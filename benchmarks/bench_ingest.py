@@ -0,0 +1,63 @@
+"""Vergleicht das alte iterrows-Einlesen mit dem spaltenweisen parse_workbook.
+
+Aufruf (aus dem Repo-Ordner):  python benchmarks/bench_ingest.py [datei.xlsx] [runden]
+"""
+import io
+import os
+import sys
+import time
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from couchpilot_library import LocalLibrary, parse_workbook, category_for_url
+
+def legacy_parse(content, url):
+    # Unveränderte Schleife aus dem alten load_data_from_github
+    library = {}
+    with io.BytesIO(content) as f:
+        xls = pd.ExcelFile(f, engine='openpyxl')
+        for sheet in xls.sheet_names:
+            df = pd.read_excel(xls, sheet_name=sheet, dtype=str)
+            col_t = next((c for c in df.columns if str(c).lower() in ["titel", "name", "filmtitel"]), None)
+            col_g = next((c for c in df.columns if str(c).lower() in ["genre", "genres"]), None)
+            col_a = next((c for c in df.columns if str(c).lower() in ["schauspieler", "darsteller", "cast"]), None)
+            col_p = next((c for c in df.columns if str(c).lower() in ["handlung", "inhalt", "plot", "beschreibung"]), None)
+            if col_t:
+                for _, row in df.iterrows():
+                    t = str(row[col_t]).strip()
+                    if len(t) > 1:
+                        cat = "Serie" if "Serie" in url else "Film"
+                        genre = str(row[col_g]) if col_g and pd.notna(row[col_g]) else ""
+                        actors = str(row[col_a]) if col_a and pd.notna(row[col_a]) else ""
+                        plot = str(row[col_p]) if col_p and pd.notna(row[col_p]) else ""
+                        library[t.lower()] = {
+                            "title": t, "path": sheet, "type": cat,
+                            "genre": genre, "actors": actors, "plot": plot
+                        }
+    return library
+
+def vectorized_parse(content, url):
+    return LocalLibrary([parse_workbook(content, category_for_url(url))])
+
+def best_of(fn, rounds):
+    times = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t0)
+    return min(times), result
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "Filme_Rosi_2025_DE.xlsx"
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    with open(path, "rb") as f: content = f.read()
+
+    t_old, old = best_of(lambda: legacy_parse(content, path), rounds)
+    t_new, new = best_of(lambda: vectorized_parse(content, path), rounds)
+
+    print(f"Datei: {path} ({len(content) / 1024:.0f} KB), beste von {rounds} Runden")
+    print(f"  iterrows:     {t_old * 1000:8.1f} ms  ({len(old)} Titel)")
+    print(f"  spaltenweise: {t_new * 1000:8.1f} ms  ({len(new)} Titel)")
+    print(f"  Faktor:       {t_old / t_new:8.2f}x")
+    missing = set(old) - set(new) - {"nan"}
+    if missing: print(f"  ⚠️ {len(missing)} Titel fehlen im neuen Pfad, z.B. {sorted(missing)[:5]}")
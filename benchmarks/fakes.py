@@ -0,0 +1,371 @@
+"""Lokale Stellvertreter für TMDB, GitHub-Raw und Google Sheets – nur für die Benchmarks.
+
+- FakeTmdbServer: HTTP-Server mit den TMDB-Pfaden, die die App benutzt. Antworten kommen aus
+  fixtures/recorded.json (echte, mitgeschnittene Antworten) oder werden aus den Vorlagen in
+  fixtures/tmdb_titles.json deterministisch erzeugt. Mit record=True werden fehlende Antworten
+  einmal bei der echten API geholt (TMDB_API_KEY in der Umgebung) und gespeichert.
+- LibraryFileServer: liefert synthetische Excel-Listen beliebiger Größe mit ETag/304 wie GitHub.
+- MemoryWorksheet / FakeGSheetsConnection: gspread-artiges Blatt im Speicher mit optionaler Latenz.
+"""
+import collections
+import hashlib
+import io
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qsl, urlencode
+import pandas as pd
+import requests
+from PIL import Image
+from streamlit.connections import BaseConnection
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.dirname(HERE)
+sys.path.insert(0, REPO)
+from couchpilot_db import DB_COLUMNS, frame_from_rows, rows_from_frame
+
+FIXTURES = os.path.join(HERE, "fixtures")
+REAL_TMDB = "https://api.themoviedb.org/3"
+
+# --- HTTP-GRUNDGERÜST ---
+class _Server:
+    """Startet einen ThreadingHTTPServer auf einem freien Port im Hintergrund."""
+
+    def __init__(self, handler):
+        outer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            def do_GET(self): handler(outer, self)
+            def log_message(self, *args): pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.requests = 0
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name=type(self).__name__, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self): return self.start()
+    def __exit__(self, *exc): self.stop()
+
+def send(req, status, body=b"", content_type="application/json", headers=None):
+    req.send_response(status)
+    req.send_header("Content-Type", content_type)
+    req.send_header("Content-Length", str(len(body)))
+    for k, v in (headers or {}).items(): req.send_header(k, v)
+    req.end_headers()
+    if body: req.wfile.write(body)
+
+# --- TMDB ---
+def fixture_key(path, query):
+    """Pfad + sortierte Parameter ohne api_key -> Schlüssel in recorded.json."""
+    params = sorted((k, v) for k, v in query.items() if k != "api_key")
+    return f"{path}?{urlencode(params)}" if params else path
+
+class FakeTmdbServer(_Server):
+    """TMDB-Attrappe. latency: künstliche Antwortzeit pro Anfrage (Sekunden), wie über das Netz."""
+
+    def __init__(self, latency=0.02, record=False, recorded_path=os.path.join(FIXTURES, "recorded.json")):
+        super().__init__(FakeTmdbServer._handle)
+        self.latency = latency
+        self.record = record
+        self.recorded_path = recorded_path
+        with open(os.path.join(FIXTURES, "tmdb_titles.json"), encoding="utf-8") as f: self.templates = json.load(f)
+        try:
+            with open(recorded_path, encoding="utf-8") as f: self.recorded = json.load(f)
+        except (OSError, ValueError):
+            self.recorded = {}
+        self._lock = threading.Lock()
+        self._poster = None
+
+    @property
+    def base_url(self):
+        return f"{self.url}/3"
+
+    @property
+    def image_base_url(self):
+        return f"{self.url}/t/p/w500"
+
+    def publish(self, rows, path, content):
+        """Beliebige Datei unter /<zeilen>/<pfad> bereitstellen, z.B. Snapshot-Partitionen und Manifest."""
+        with self._lock: self._files[(rows, path)] = (f'"{hashlib.sha1(content).hexdigest()}"', content)
+
+    def unpublish(self, rows, path):
+        with self._lock: self._files.pop((rows, path), None)
+
+    def content(self, rows, path):
+        return self._files[(rows, path)][1]
+
+    def _handle(self, req):
+        with self._lock: self.requests += 1
+        time.sleep(self.latency)
+        parts = urlsplit(req.path)
+        if parts.path.startswith("/t/p/"): return send(req, 200, self.poster_bytes(), "image/jpeg")
+        path, query = parts.path[len("/3"):], dict(parse_qsl(parts.query))
+        key = fixture_key(path, query)
+        body = self.recorded.get(key)
+        if body is None and self.record: body = self._record(key, path, query)
+        if body is None: body = self.synthesize(path, query)
+        if body is None: return send(req, 404, b'{"success": false, "status_code": 34}')
+        send(req, 200, json.dumps(body).encode("utf-8"))
+
+    def _record(self, key, path, query):
+        resp = requests.get(f"{REAL_TMDB}{path}", params={**query, "api_key": os.environ["TMDB_API_KEY"]}, timeout=10)
+        if resp.status_code != 200: return None
+        with self._lock:
+            self.recorded[key] = resp.json()
+            with open(self.recorded_path, "w", encoding="utf-8") as f: json.dump(self.recorded, f, ensure_ascii=False)
+        return self.recorded[key]
+
+    def poster_bytes(self):
+        # Ein 500x750-JPEG wie bei w500, einmal erzeugt
+        if self._poster is None:
+            buf = io.BytesIO()
+            Image.new("RGB", (500, 750), (40, 60, 90)).save(buf, "JPEG", quality=85)
+            self._poster = buf.getvalue()
+        return self._poster
+
+    # Synthetische Antworten
+    def _item(self, media, template, new_id=None, credits=False):
+        it = {k: v for k, v in template.items() if k != "cast"}
+        if new_id is not None and new_id != template["id"]:
+            it["id"] = new_id
+            name_key = "title" if media == "movie" else "name"
+            it[name_key] = f"{template[name_key]} {new_id % 97}"
+            it["poster_path"] = f"/fake{new_id}.jpg"
+        if credits:
+            it["credits"] = {"cast": [{"id": pid, "name": name, "character": ""} for pid, name in template["cast"]]}
+            it["genres"] = [{"id": g, "name": str(g)} for g in it["genre_ids"]]
+        return it
+
+    def _page(self, media, seed, page, n=20):
+        templates = self.templates[media]
+        rng = random.Random(f"{seed}|{page}")
+        out = []
+        for i in range(n):
+            t = templates[(page * n + i) % len(templates)]
+            m_id = t["id"] if page == 1 and i < len(templates) else 10_000_000 + rng.randrange(10_000_000)
+            out.append(self._item(media, t, m_id))
+        return {"page": page, "total_pages": 50, "total_results": 1000, "results": out}
+
+    def _template_for(self, media, m_id):
+        templates = self.templates[media]
+        return next((t for t in templates if t["id"] == m_id), templates[m_id % len(templates)])
+
+    def synthesize(self, path, query):
+        parts = [p for p in path.split("/") if p]
+        page = int(query.get("page", 1))
+        if parts[:1] == ["search"]:
+            q = query.get("query", "").lower()
+            media = parts[1] if parts[1] in ("movie", "tv") else None
+            hits = []
+            for m in ((media,) if media else ("movie", "tv")):
+                for t in self.templates[m]:
+                    names = (t.get("title") or t.get("name") or "").lower(), (t.get("original_title") or t.get("original_name") or "").lower()
+                    if any(q and q in n for n in names): hits.append({**self._item(m, t), "media_type": m})
+            found = {it["id"] for it in hits}
+            rest = [{**it, "media_type": media or "movie"} for it in self._page(media or "movie", q, page)["results"] if it["id"] not in found]
+            results = hits + rest[:20 - len(hits)]
+            return {"page": page, "total_pages": 5, "total_results": 100, "results": results}
+        if parts[:1] == ["discover"] or parts[-1:] in (["top_rated"], ["recommendations"], ["popular"]):
+            media = "tv" if "tv" in parts else "movie"
+            return self._page(media, path + query.get("with_genres", "") + query.get("with_cast", ""), page)
+        if parts[:1] == ["find"]:
+            t = self.templates["movie"][int(hashlib.sha1(parts[1].encode()).hexdigest(), 16) % len(self.templates["movie"])]
+            return {"movie_results": [self._item("movie", t)], "tv_results": []}
+        if len(parts) == 2 and parts[0] in ("movie", "tv") and parts[1].isdigit():
+            m_id = int(parts[1])
+            return self._item(parts[0], self._template_for(parts[0], m_id), m_id, credits=True)
+        return None
+
+# --- GITHUB RAW ---
+LIBRARY_FILES = {"Filme_Rosi_2025_DE.xlsx": 0.6, "Filme_Rosi_2025_Kairo.xlsx": 0.2, "Serien_Rosi_2025.xlsx": 0.2}
+SHEETS_PER_FILE = 12
+
+def source_rows():
+    """Echte Zeilen aus den Listen im Repo als Vorlage für die synthetischen Arbeitsmappen."""
+    frames = []
+    for name in LIBRARY_FILES:
+        path = os.path.join(REPO, name)
+        if not os.path.exists(path): continue
+        for df in pd.read_excel(path, sheet_name=None, dtype=str).values():
+            frames.append(df.rename(columns=str))
+    df = pd.concat(frames, ignore_index=True)
+    return df[df["Filmtitel"].notna()].reset_index(drop=True) if "Filmtitel" in df else df
+
+def make_workbook(path, rows, template, seed=0):
+    """Schreibt eine Arbeitsmappe mit `rows` Zeilen; über die Vorlage hinaus mit durchnummerierten Titeln."""
+    idx = pd.Series(range(rows)) % len(template)
+    df = template.iloc[idx.to_numpy()].reset_index(drop=True).copy()
+    rounds = pd.Series(range(rows)) // len(template)
+    suffix = rounds.map(lambda r: "" if r == 0 else f" ({seed}-{r})")
+    df["Filmtitel"] = df["Filmtitel"].astype(str) + suffix
+    chunk = max(1, -(-rows // SHEETS_PER_FILE))
+    with pd.ExcelWriter(path, engine="openpyxl") as writer:
+        for i, start in enumerate(range(0, rows, chunk)):
+            df.iloc[start:start + chunk].to_excel(writer, sheet_name=f"Liste {i + 1}", index=False)
+
+class LibraryFileServer(_Server):
+    """Liefert /<zeilen>/<datei>.xlsx (und mit publish weitere Pfade) wie raw.githubusercontent.com (mit ETag und 304).
+
+    Die Arbeitsmappen werden beim ersten Abruf einer Größe erzeugt und unter cache_dir abgelegt.
+    """
+
+    def __init__(self, cache_dir=os.path.join(HERE, ".cache"), latency=0.05):
+        super().__init__(LibraryFileServer._handle)
+        self.cache_dir = cache_dir
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._template = None
+        self._files = {}  # (größe, datei) -> (etag, bytes)
+
+    def base_url(self, rows):
+        return f"{self.url}/{rows}/"
+
+    def prepare(self, rows):
+        """Erzeugt (oder findet) die drei Arbeitsmappen für eine Bibliotheksgröße."""
+        with self._lock:
+            for i, (name, share) in enumerate(LIBRARY_FILES.items()):
+                if (rows, name) in self._files: continue
+                path = os.path.join(self.cache_dir, str(rows), name)
+                if not os.path.exists(path):
+                    if self._template is None: self._template = source_rows()
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    make_workbook(path + ".tmp.xlsx", max(1, int(rows * share)), self._template, seed=i)
+                    os.replace(path + ".tmp.xlsx", path)
+                with open(path, "rb") as f: content = f.read()
+                self._files[(rows, name)] = (f'"{hashlib.sha1(content).hexdigest()}"', content)
+
+    def publish(self, rows, path, content):
+        """Beliebige Datei unter /<zeilen>/<pfad> bereitstellen, z.B. Snapshot-Partitionen und Manifest."""
+        with self._lock: self._files[(rows, path)] = (f'"{hashlib.sha1(content).hexdigest()}"', content)
+
+    def unpublish(self, rows, path):
+        with self._lock: self._files.pop((rows, path), None)
+
+    def content(self, rows, path):
+        return self._files[(rows, path)][1]
+
+    def _handle(self, req):
+        with self._lock: self.requests += 1
+        time.sleep(self.latency)
+        parts = urlsplit(req.path).path.strip("/").split("/", 1)
+        if len(parts) != 2 or not parts[0].isdigit(): return send(req, 404)
+        entry = self._files.get((int(parts[0]), parts[1]))
+        if entry is None: return send(req, 404)
+        etag, content = entry
+        if req.headers.get("If-None-Match") == etag: return send(req, 304, headers={"ETag": etag})
+        send(req, 200, content, "application/octet-stream", {"ETag": etag})
+
+# --- GOOGLE SHEETS ---
+class _Cell:
+    def __init__(self, value): self.value = value
+
+class MemoryWorksheet:
+    """Die gspread-Worksheet-Methoden, die GspreadSheet benutzt; latency pro API-Aufruf.
+
+    Auch für die Tests: method_calls zählt je Methode, failures[methode] = Exception lässt
+    den nächsten Aufruf dieser Methode einmal scheitern (z.B. Quota-Fehler).
+    """
+
+    def __init__(self, rows, latency=0.0):
+        self.rows = [list(r) for r in rows]
+        self.latency = latency
+        self.calls = 0
+        self.method_calls = collections.Counter()
+        self.failures = {}
+
+    def _call(self, method):
+        self.calls += 1
+        self.method_calls[method] += 1
+        if self.latency: time.sleep(self.latency)
+        error = self.failures.pop(method, None)
+        if error is not None: raise error
+
+    def get_all_values(self):
+        self._call("get_all_values")
+        return [[str(v) for v in r] for r in self.rows]
+
+    def cell(self, row, col):
+        self._call("cell")
+        values = self.rows[row - 1] if 0 < row <= len(self.rows) else []
+        return _Cell(str(values[col - 1]) if col <= len(values) else "")
+
+    def col_values(self, col):
+        self._call("col_values")
+        return [str(r[col - 1]) if col <= len(r) else "" for r in self.rows]
+
+    def append_row(self, values, value_input_option=None):
+        self._call("append_row")
+        self.rows.append(list(values))
+
+    def batch_update(self, data, value_input_option=None):
+        from gspread.utils import a1_to_rowcol
+        self._call("batch_update")
+        for entry in data:
+            row, col = a1_to_rowcol(entry["range"])
+            values = self.rows[row - 1]
+            values.extend([""] * (col - len(values)))
+            values[col - 1] = entry["values"][0][0]
+
+    def delete_rows(self, row):
+        self._call("delete_rows")
+        del self.rows[row - 1]
+
+    def clear(self):
+        self._call("clear")
+        self.rows = []
+
+    def update(self, rows, value_input_option=None):
+        self._call("update")
+        self.rows = [list(r) for r in rows]
+
+def sheet_rows(n, seed=0):
+    """n Einträge im Format der Datenbank-Tabelle, gemischt Watchlist und Gesehen."""
+    rng = random.Random(seed)
+    rows = [list(DB_COLUMNS)]
+    for i in range(n):
+        seen = rng.random() < 0.6
+        values = {"id": str(20_000_000 + i), "title": f"Titel {i}", "status": "seen" if seen else "watchlist",
+                  "user_rating": str(rng.randint(1, 10)) if seen else "0", "added_date": "2025-01-01", "source": "Benchmark"}
+        rows.append([values.get(c, "") for c in DB_COLUMNS])
+    return rows
+
+class FakeGSheetsConnection(BaseConnection):
+    """Ersatz für streamlit_gsheets.GSheetsConnection (read/update + client._select_worksheet).
+
+    Inhalt und Latenz setzt der Benchmark über die Klassenattribute, bevor die App läuft.
+    """
+    rows = None
+    latency = 0.0
+
+    def _connect(self, **kwargs):
+        return MemoryWorksheet(self.rows or sheet_rows(0), self.latency)
+
+    @property
+    def client(self):
+        return self
+
+    def _select_worksheet(self, spreadsheet=None, worksheet=None):
+        return self._instance
+
+    def read(self, spreadsheet=None, ttl=None, **kwargs):
+        return frame_from_rows(self._instance.get_all_values())
+
+    def update(self, spreadsheet=None, data=None, **kwargs):
+        self._instance.update(rows_from_frame(data))
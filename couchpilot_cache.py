@@ -0,0 +1,141 @@
+import threading
+import time
+from collections import OrderedDict
+
+def format_age(seconds):
+    if seconds is None: return "leer"
+    if seconds < 60: return f"{seconds:.0f}s"
+    if seconds < 3600: return f"{seconds / 60:.0f} min"
+    return f"{seconds / 3600:.1f} h"
+
+class CacheRegistry:
+    """Benannte Cache-Bereiche (Bibliothek, DB, TMDB, Feeds), die einzeln geleert werden.
+
+    Jeder Bereich kennt seine Leer-Funktionen. Lader melden sich per touch(), sobald sie
+    wirklich neu rechnen; daraus ergeben sich Alter und Größe für die Admin-Leiste.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._scopes = {}
+
+    def register(self, name, label, clear_fns, size_fn=None):
+        with self._lock:
+            scope = self._scopes.setdefault(name, {"loaded_at": None, "sizes": {}})
+            scope.update(label=label, clear_fns=list(clear_fns), size_fn=size_fn)
+
+    def touch(self, name, size=None, key=None):
+        with self._lock:
+            scope = self._scopes.setdefault(name, {"label": name, "clear_fns": [], "size_fn": None, "loaded_at": None, "sizes": {}})
+            scope["loaded_at"] = time.time()
+            if size is not None: scope["sizes"][key] = size
+
+    def invalidate(self, *names):
+        for name in names:
+            with self._lock:
+                scope = self._scopes.get(name)
+                if not scope: continue
+                scope["loaded_at"] = None
+                scope["sizes"] = {}
+                clear_fns = list(scope["clear_fns"])
+            for fn in clear_fns: fn()
+
+    def names(self):
+        with self._lock:
+            return list(self._scopes)
+
+    def info(self):
+        now = time.time()
+        with self._lock:
+            scopes = [(name, dict(s)) for name, s in self._scopes.items()]
+        rows = []
+        for name, s in scopes:
+            size = s["size_fn"]() if s.get("size_fn") else (sum(s["sizes"].values()) if s["sizes"] else None)
+            age = now - s["loaded_at"] if s["loaded_at"] else None
+            rows.append({"name": name, "label": s.get("label", name), "age": age, "size": size})
+        return rows
+
+# --- GETEILTER ZUSTAND ---
+class Singleflight:
+    """Gleichzeitige Anfragen zum selben Schlüssel bündeln: einer rechnet, alle anderen warten auf sein Ergebnis."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.stats = {"leader": 0, "joined": 0}
+
+    def do(self, key, fn):
+        """Liefert (ergebnis, selbst_gerechnet). Eine Ausnahme des Rechnenden erreicht alle Wartenden."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader: call = self._calls[key] = {"done": threading.Event(), "result": None, "error": None}
+            self.stats["leader" if leader else "joined"] += 1
+        if not leader:
+            call["done"].wait()
+            if call["error"] is not None: raise call["error"]
+            return call["result"], False
+        try:
+            call["result"] = fn()
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock: self._calls.pop(key, None)
+            call["done"].set()
+        return call["result"], True
+
+class SharedStore:
+    """Prozessweiter Speicher für fertig aufbereitete Objekte (z.B. TMDB-Ergebnisseiten mit Besetzung).
+
+    Alle Sessions bekommen dasselbe Objekt und dürfen es nur lesen. LRU mit Ablaufzeit,
+    Nachladen läuft über Singleflight, damit zehn Sessions eine Seite nur einmal bauen.
+    """
+
+    def __init__(self, max_items=500, ttl=3600):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+        self._flight = Singleflight()
+        self.stats = {"hit": 0, "miss": 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._items.get(key)
+            if entry and entry[0] > time.time():
+                self._items.move_to_end(key)
+                self.stats["hit"] += 1
+                return entry[1]
+        return None
+
+    def put(self, key, value, ttl=None):
+        with self._lock:
+            self._items[key] = (time.time() + (ttl or self.ttl), value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items: self._items.popitem(last=False)
+
+    def get_or_load(self, key, loader, ttl=None):
+        value = self.get(key)
+        if value is not None: return value
+
+        def _load():
+            # Ein zweiter Blick: vielleicht hat ein anderer Thread gerade fertig geladen
+            cached = self.get(key)
+            if cached is not None: return cached
+            with self._lock: self.stats["miss"] += 1
+            value = loader()
+            if value: self.put(key, value, ttl)
+            return value
+
+        return self._flight.do(key, _load)[0]
+
+    def clear(self):
+        with self._lock: self._items.clear()
+
+    def __len__(self):
+        with self._lock: return len(self._items)
+
+    def summary(self):
+        with self._lock:
+            return {**self.stats, **self._flight.stats, "items": len(self._items)}
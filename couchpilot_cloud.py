@@ -1,19 +1,32 @@
 import streamlit as st
-import pandas as pd
-import requests
-import xml.etree.ElementTree as ET
 import random
-import html
-import io
-import re
-from streamlit_gsheets import GSheetsConnection
+import json
+import os
+import time
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from rapidfuzz import process, fuzz
 import calendar
+import math
+# Nur leichte Module hier oben. pandas, streamlit_gsheets (gspread + Google-Auth) und die Module mit
+# pandas/rapidfuzz (Bibliothek, Verknüpfungen, Empfehlungen) werden erst in den Funktionen importiert,
+# die sie brauchen -> der erste Durchlauf im TV-Reiter lädt sie gar nicht.
+from couchpilot_metrics import METRICS
+from couchpilot_cache import CacheRegistry, SharedStore, format_age
+from couchpilot_feeds import FeedIngester
+from couchpilot_db import SheetDB, GspreadSheet, LocalStore, SheetSync, apply_status_to_frame, normalize_id
+from couchpilot_posters import PosterCache
+from couchpilot_tmdb import TmdbCache, RateLimiter, cached_get_json, attach_credits, cache_key, media_kind, DiscoverStream, make_session
 
 # --- 1. KONFIGURATION ---
 st.set_page_config(page_title="CouchPilot", page_icon="🎬", layout="wide", initial_sidebar_state="collapsed")
 
+# Messung pro Durchlauf. Ein mit st.rerun()/st.stop() abgebrochener Vorgänger wird hier nachträglich abgeschlossen.
+if st.session_state.get('run_trace') is not None:
+    st.session_state['last_trace'] = METRICS.finish_run(st.session_state['run_trace'], aborted=True)
+st.session_state['run_trace'] = METRICS.begin_run()
+METRICS.section("login")
+
 # --- 2. TÜRSTEHER (LOGIN SCHUTZ MIT URL-SUPPORT) ---
 def check_password():
     """Prüft das Passwort via Eingabe oder URL-Parameter."""
@@ -52,14 +65,19 @@ if not check_password():
     st.stop()
 
 # --- 3. SESSION STATE ---
-if 'tv_infos' not in st.session_state: st.session_state['tv_infos'] = {}
+METRICS.section("start")
 if 'search_results' not in st.session_state: st.session_state['search_results'] = []
 if 'explore_results' not in st.session_state: st.session_state['explore_results'] = []
+if 'explore_stream' not in st.session_state: st.session_state['explore_stream'] = None
 if 'search_query' not in st.session_state: st.session_state['search_query'] = ""
-if 'tv_data' not in st.session_state: st.session_state['tv_data'] = []
-if 'mediathek_data' not in st.session_state: st.session_state['mediathek_data'] = []
+if 'tv_feed' not in st.session_state: st.session_state['tv_feed'] = "tv2015"
 
 # --- KONSTANTEN & API ---
+FEEDS = {
+    "tv2015": ("https://www.tvspielfilm.de/tv-programm/rss/heute2015.xml", "TV"),
+    "tv2200": ("https://www.tvspielfilm.de/tv-programm/rss/heute2200.xml", "TV"),
+    "mediathek": ("https://www.filmdienst.de/rss/mediatheken", "Mediathek"),
+}
 GENRE_MAP = {
     28: "Action", 12: "Abenteuer", 16: "Animation", 35: "Komödie", 80: "Krimi", 99: "Doku", 18: "Drama", 
     10751: "Familie", 14: "Fantasy", 36: "Historie", 27: "Horror", 10402: "Musik", 9648: "Mystery", 
@@ -69,142 +87,414 @@ GENRE_MAP = {
 
 TMDB_API_KEY = st.secrets["TMDB_API_KEY"]
 GITHUB_TOKEN = st.secrets.get("GITHUB_TOKEN")
-TMDB_BASE_URL = "https://api.themoviedb.org/3"
-IMAGE_BASE_URL = "https://image.tmdb.org/t/p/w500"
+# Die Basis-URLs lassen sich für die Offline-Benchmarks (benchmarks/bench_app.py) auf lokale Server umbiegen
+TMDB_BASE_URL = os.environ.get("COUCHPILOT_TMDB_BASE_URL", "https://api.themoviedb.org/3")
+IMAGE_BASE_URL = os.environ.get("COUCHPILOT_IMAGE_BASE_URL", "https://image.tmdb.org/t/p/w500")
+LIBRARY_BASE_URL = os.environ.get("COUCHPILOT_LIBRARY_BASE_URL", "https://raw.githubusercontent.com/Puntjak1980/meine-filmdatenbank/main/")
 SHEET_URL = "https://docs.google.com/spreadsheets/d/1kXU0mgitV_a9dUS1gJto5qX108H9-2HygxL-r3vQ_Hk/edit"
+LIBRARY_URLS = [
+    f"{LIBRARY_BASE_URL}Filme_Rosi_2025_DE.xlsx",
+    f"{LIBRARY_BASE_URL}Filme_Rosi_2025_Kairo.xlsx",
+    f"{LIBRARY_BASE_URL}Serien_Rosi_2025.xlsx"
+]
+METRICS_PROM_PATH = os.environ.get("COUCHPILOT_METRICS_PROM")  # optional: Prometheus-Textdatei nach jedem Durchlauf
+CACHE_DIR = os.environ.get("COUCHPILOT_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".couchpilot_cache"))
 
 # --- HELFER FUNKTIONEN ---
 def get_genres_string(ids):
     if not ids: return ""
     return ", ".join(filter(None, [GENRE_MAP.get(i, "") for i in ids]))
 
-def clean_html(raw_text):
-    if not raw_text: return ""
-    return re.sub(r'<[^>]+>', '', html.unescape(raw_text)).strip()
+@st.cache_resource
+def get_cache_registry():
+    return CacheRegistry()
 
-def fetch_tmdb(url):
-    try:
-        response = requests.get(url, timeout=5)
-        return response.json() if response.status_code == 200 else {}
-    except: return {}
+@st.cache_resource
+def get_tmdb_cache():
+    get_cache_registry().touch("tmdb")
+    return TmdbCache(os.path.join(CACHE_DIR, "tmdb.sqlite"))
 
-def get_feed_items(url, tag_prefix):
-    items = []
-    try:
-        resp = requests.get(url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=5)
-        if resp.status_code == 200:
-            tree = ET.fromstring(resp.content)
-            for item in tree.findall('./channel/item'):
-                title = item.find('title').text
-                raw_desc = item.find('description').text or ""
-                desc = clean_html(raw_desc)
-                items.append({"title": title, "desc": desc, "tag": tag_prefix})
-    except: pass
-    return items
-
-def find_local_fuzzy(tmdb_title, library):
-    if not tmdb_title or not library: return None
-    t_clean = tmdb_title.lower()
-    if t_clean in library: return library[t_clean]
-    choices = list(library.keys())
-    match = process.extractOne(t_clean, choices, scorer=fuzz.WRatio, score_cutoff=85)
-    return library[match[0]] if match else None
+@st.cache_resource
+def get_tmdb_limiter():
+    return RateLimiter(rate=40)
+
+@st.cache_resource
+def get_background_limiter():
+    # Massenauflösung im Hintergrund höchstens 10/s aus dem gemeinsamen Budget -> Suche bleibt flott
+    return RateLimiter(rate=10, parent=get_tmdb_limiter())
+
+def fetch_tmdb(url):
+    return cached_get_json(url, get_tmdb_cache(), get_http_session(), limiter=get_tmdb_limiter())
+
+def tmdb_fetcher(limiter=None, cached=True):
+    """fetch(url) für Hintergrund-Threads: Cache, Session und Limiter werden hier im Skript-Thread
+    eingesammelt, dort wäre st.cache_resource nicht verfügbar. cached=False für Einmal-Abfragen,
+    die den TMDB-Cache der Oberfläche nur verdrängen würden."""
+    cache, session, limiter = get_tmdb_cache() if cached else None, get_http_session(), limiter or get_tmdb_limiter()
+    return lambda url: cached_get_json(url, cache, session, limiter=limiter)
+
+def with_credits(items):
+    return attach_credits(items, TMDB_BASE_URL, TMDB_API_KEY, get_tmdb_cache(), get_http_session(), get_tmdb_limiter())
+
+@st.cache_resource
+def get_recommender():
+    from couchpilot_recommend import FeatureSpace, Recommender
+    # Poolaufbau (~600 Aufrufe) im Hintergrund-Budget, sonst warten die Suchen aller Sessions am Limiter
+    return Recommender(FeatureSpace(list(GENRE_MAP)), tmdb_fetcher(get_background_limiter()), TMDB_BASE_URL, TMDB_API_KEY)
+
+@st.cache_resource
+def get_prefetch_pool():
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="prefetch")
+
+def new_discover_stream(url):
+    # Vorladen läuft im Pool-Thread -> auch die Handles für die Besetzung hier einsammeln
+    cache, session, limiter, posters = get_tmdb_cache(), get_http_session(), get_tmdb_limiter(), get_poster_cache()
+
+    def enrich(items):
+        attach_credits(items, TMDB_BASE_URL, TMDB_API_KEY, cache, session, limiter)
+        posters.warm([m.get('poster_path') for m in items])
+
+    return DiscoverStream(url, tmdb_fetcher(), enrich, get_prefetch_pool())
+
+@st.cache_resource
+def get_shared_store():
+    return SharedStore(max_items=500, ttl=3600)
+
+def resolved_page(url, limit=15):
+    """Ergebnisseite inkl. Besetzung. Alle Sessions teilen sich dieselbe (nur lesend benutzte) Liste."""
+    return get_shared_store().get_or_load(cache_key(url), lambda: with_credits(fetch_tmdb(url).get('results', [])[:limit]))
+
+def resolved_search(query):
+    """Suche wie bisher: ist der beste Treffer eine Person, kommen ihre populärsten Filme."""
+    url = f"{TMDB_BASE_URL}/search/multi?api_key={TMDB_API_KEY}&query={quote(query)}&language=de-DE"
+
+    def _load():
+        results = fetch_tmdb(url).get('results', [])
+        if not results: return None  # leer oder Netzfehler -> nicht für alle festhalten
+        if results[0].get('media_type') == 'person':
+            person = results[0]
+            movies = resolved_page(f"{TMDB_BASE_URL}/discover/movie?api_key={TMDB_API_KEY}&with_cast={person['id']}&sort_by=popularity.desc&language=de-DE")
+            return {"person": person.get('name'), "results": movies}
+        return {"person": None, "results": with_credits(results[:15])}
+
+    return get_shared_store().get_or_load(cache_key(url) + "#seite", _load)
+
+@st.cache_resource
+def get_poster_cache():
+    get_cache_registry().touch("posters")
+    return PosterCache(os.path.join(CACHE_DIR, "posters"), session=get_http_session(), source_base_url=IMAGE_BASE_URL)
+
+def warm_posters(items):
+    get_poster_cache().warm([m.get('poster_path') for m in items])
+
+def show_poster(container, poster_path, size="card", **kwargs):
+    # Lokales WebP-Vorschaubild; nur wenn TMDB gerade nicht liefert, direkt die Original-URL
+    if not poster_path: return
+    data = get_poster_cache().get(poster_path, size)
+    container.image(data or f"{IMAGE_BASE_URL}{poster_path}", **kwargs)
+
+@st.cache_resource
+def get_feed_ingester():
+    fetch, registry = tmdb_fetcher(), get_cache_registry()
+
+    def resolve(query):
+        res = fetch(f"{TMDB_BASE_URL}/search/multi?api_key={TMDB_API_KEY}&query={quote(query)}&language=de-DE")
+        return next((r for r in res.get('results', []) if r.get('media_type') in ('movie', 'tv')), None)
+
+    ingester = FeedIngester(FEEDS, resolve, os.path.join(CACHE_DIR, "feeds.json"), session=get_http_session(),
+                            on_change=lambda: registry.touch("feeds", ingester.total_items()))
+    registry.touch("feeds", ingester.total_items())
+    return ingester.start()
+
+def paginate(items, key, sizes=(10, 20, 50, 100), default=20):
+    """Seitenwahl für lange Listen. Liefert (start, ausschnitt); gerendert wird nur der Ausschnitt."""
+    total = len(items)
+    c_size, c_page, c_info = st.columns([1, 1, 2])
+    size = c_size.selectbox("Pro Seite:", sizes, index=sizes.index(default), key=f"{key}_size")
+    pages = max(1, math.ceil(total / size))
+    page_key = f"{key}_page"
+    if st.session_state.get(page_key, 1) > pages: st.session_state[page_key] = pages
+    page = c_page.number_input("Seite:", min_value=1, max_value=pages, step=1, key=page_key)
+    start = (page - 1) * size
+    c_info.caption(f"{min(start + 1, total)}–{min(start + size, total)} von {total} · Seite {page}/{pages}")
+    chunk = items.iloc[start:start + size] if hasattr(items, "iloc") else items[start:start + size]
+    return start, chunk
+
+def waterfall_lines(trace, width=28, min_seconds=0.001):
+    """Textbalken je Messpunkt eines Durchlaufs; Cache-Treffer unter 1 ms werden nur gezählt."""
+    total = max(trace.total or 0, 1e-6)
+    shown = [e for e in trace.events if e['seconds'] >= min_seconds or e['error']]
+    lines = []
+    for e in sorted(shown, key=lambda e: e['offset']):
+        start = int(max(e['offset'], 0) / total * width)
+        length = max(1, round(e['seconds'] / total * width))
+        label = f"{e['kind']}:{e['name']}"[:24]
+        flag = f" ⚠️ {e['error']}" if e['error'] else (f" ({e['cache']})" if e['cache'] else "")
+        lines.append(f"{label:<24} {e['offset'] * 1000:6.0f} {e['seconds'] * 1000:6.0f} ms |{' ' * start}{'█' * length}{flag}")
+    hidden = len(trace.events) - len(shown)
+    if hidden: lines.append(f"… {hidden} schnelle Aufrufe unter {min_seconds * 1000:.0f} ms")
+    return lines
+
+def show_metrics_panel():
+    if not st.sidebar.toggle("⏱️ Messwerte", key="show_metrics"): return
+    with st.sidebar.expander("⏱️ Letzter Durchlauf", expanded=True):
+        trace = st.session_state.get('last_trace')
+        if trace is None: st.caption("Noch kein abgeschlossener Durchlauf.")
+        else:
+            st.caption(f"{trace.label or '?'} · {trace.total * 1000:.0f} ms{' · abgebrochen (rerun)' if trace.aborted else ''}")
+            st.code("\n".join(waterfall_lines(trace)) or "–", language=None)
+    with st.sidebar.expander("📈 p50 / p95"):
+        rows = METRICS.summary()
+        if rows:
+            import pandas as pd
+            df = pd.DataFrame(rows)
+            df['hit_rate'] = df['hit_rate'].map(lambda v: f"{v:.0%}" if pd.notna(v) else "")
+            st.dataframe(df.round(1), hide_index=True, use_container_width=True)
+        trace = st.session_state.get('last_trace')
+        events = "\n".join(json.dumps(e, ensure_ascii=False) for e in (trace.events if trace else []))
+        c_jsonl, c_prom = st.columns(2)
+        c_jsonl.download_button("JSONL", events, "couchpilot_lauf.jsonl", "application/jsonl")
+        c_prom.download_button("Prometheus", METRICS.prometheus_text(), "couchpilot.prom", "text/plain")
+
+def find_local_fuzzy(tmdb_title, matcher):
+    if not tmdb_title or not matcher: return None
+    return matcher.match(tmdb_title)
+
+def find_local_batch(items, library, links, matcher):
+    """Prüft eine ganze Ergebnisseite gegen die Sammlung -> {tmdb_id: Bibliothekseintrag}.
+
+    Zuerst per TMDB-ID über die Verknüpfungstabelle. Der Titelabgleich bleibt nur für Zeilen, die
+    (noch) keine TMDB-ID haben, und darf keine Zeile treffen, die schon einem anderen Titel gehört.
+    """
+    if not items: return {}
+    hits, rest = {}, []
+    for m in items:
+        m_id = str(m['id']).replace('.0', '')
+        key = links.lookup(media_kind(m), m_id) if links else None
+        if key is not None and key in library: hits[m_id] = library[key]
+        else: rest.append(m)
+    if rest and matcher:
+        titles = [m.get('title') or m.get('name') or "" for m in rest]
+        for m, found in zip(rest, matcher.match_many(titles)):
+            if found and not (links and links.is_linked(found['title'].lower())):
+                hits[str(m['id']).replace('.0', '')] = found
+    return hits
+
+@st.cache_resource
+def get_snapshot_store():
+    from couchpilot_library import SnapshotStore
+    return SnapshotStore(os.path.join(CACHE_DIR, "library"))
+
+@st.cache_resource
+def get_http_session():
+    return make_session()
 
 @st.cache_data(ttl=3600)
 def load_data_from_github():
-    library = {}
-    urls = [
-        "https://raw.githubusercontent.com/Puntjak1980/meine-filmdatenbank/main/Filme_Rosi_2025_DE.xlsx",
-        "https://raw.githubusercontent.com/Puntjak1980/meine-filmdatenbank/main/Filme_Rosi_2025_Kairo.xlsx",
-        "https://raw.githubusercontent.com/Puntjak1980/meine-filmdatenbank/main/Serien_Rosi_2025.xlsx"
-    ]
+    from couchpilot_library import MANIFEST_PATH, load_library, load_partitioned
     headers = {"Authorization": f"token {GITHUB_TOKEN}"} if GITHUB_TOKEN else {}
-    for url in urls:
-        try:
-            response = requests.get(url, headers=headers, timeout=10)
-            if response.status_code == 200:
-                with io.BytesIO(response.content) as f:
-                    xls = pd.ExcelFile(f, engine='openpyxl')
-                    for sheet in xls.sheet_names:
-                        df = pd.read_excel(xls, sheet_name=sheet, dtype=str)
-                        col_t = next((c for c in df.columns if str(c).lower() in ["titel", "name", "filmtitel"]), None)
-                        col_g = next((c for c in df.columns if str(c).lower() in ["genre", "genres"]), None)
-                        col_a = next((c for c in df.columns if str(c).lower() in ["schauspieler", "darsteller", "cast"]), None)
-                        col_p = next((c for c in df.columns if str(c).lower() in ["handlung", "inhalt", "plot", "beschreibung"]), None)
-                        
-                        if col_t:
-                            for _, row in df.iterrows():
-                                t = str(row[col_t]).strip()
-                                if len(t) > 1:
-                                    cat = "Serie" if "Serie" in url else "Film"
-                                    genre = str(row[col_g]) if col_g and pd.notna(row[col_g]) else ""
-                                    actors = str(row[col_a]) if col_a and pd.notna(row[col_a]) else ""
-                                    plot = str(row[col_p]) if col_p and pd.notna(row[col_p]) else ""
-                                    library[t.lower()] = {
-                                        "title": t, "path": sheet, "type": cat,
-                                        "genre": genre, "actors": actors, "plot": plot
-                                    }
-        except: pass
+    # Bevorzugt die Delta-Snapshots von gui_upload.py; Mappen ohne Snapshot (oder ganz ohne Manifest) wie bisher als Excel
+    try: library = load_partitioned(f"{LIBRARY_BASE_URL}{MANIFEST_PATH}", LIBRARY_URLS, headers, get_snapshot_store(), get_http_session())
+    except Exception: library = load_library(LIBRARY_URLS, headers, get_snapshot_store(), get_http_session())
+    get_cache_registry().touch("library", len(library))
     return library
 
+@st.cache_resource(ttl=3600)
+def get_library_matcher():
+    from couchpilot_library import LibraryMatcher
+    return LibraryMatcher(load_data_from_github())
+
+# Ohne TTL: die Auflösung einer großen Bibliothek dauert länger als eine Stunde. Neu gebaut wird nur über
+# den Cache-Bereich "library"; die ersetzte Instanz stoppt dabei ihren Thread. Die /find- und Suchantworten
+# gehen am TMDB-Cache vorbei: das Ergebnis steht danach ohnehin in links.sqlite.
+@st.cache_resource(on_release=lambda links: links.stop())
+def get_library_links():
+    from couchpilot_links import LibraryLinks
+    links = LibraryLinks(os.path.join(CACHE_DIR, "links.sqlite"), load_data_from_github().df,
+                         tmdb_fetcher(get_background_limiter(), cached=False), TMDB_BASE_URL, TMDB_API_KEY)
+    return links.start()
+
+@st.cache_resource(ttl=3600)
+def get_library_index():
+    from couchpilot_library import LibrarySearchIndex
+    return LibrarySearchIndex(load_data_from_github().df)
+
+def gsheets_connection():
+    from streamlit_gsheets import GSheetsConnection
+    return st.connection("gsheets", type=GSheetsConnection)
+
+def read_db_sheet():
+    import pandas as pd
+    conn = gsheets_connection()
+    with METRICS.span("sheet", "read"): df = conn.read(spreadsheet=SHEET_URL, ttl=0)
+    if df.empty: return pd.DataFrame(columns=["id", "title", "status", "user_rating", "added_date", "source"])
+    if "user_rating" not in df.columns: df["user_rating"] = 0.0
+    if "added_date" not in df.columns: df["added_date"] = ""
+    if "source" not in df.columns: df["source"] = ""
+    df['id'] = df['id'].astype(str).str.replace(r'\.0$', '', regex=True)
+    return df
+
+@st.cache_data(ttl=120)
+def load_db_sheet():
+    # Offene Änderungen liegen in der Write-Queue; nach jedem Flush wird nur dieser Bereich geleert
+    df = read_db_sheet()
+    get_cache_registry().touch("db", len(df))
+    return df
+
 def get_db_data():
-    conn = st.connection("gsheets", type=GSheetsConnection)
-    try:
-        df = conn.read(spreadsheet=SHEET_URL, ttl=0)
-        if df.empty: return pd.DataFrame(columns=["id", "title", "status", "user_rating", "added_date", "source"])
-        if "user_rating" not in df.columns: df["user_rating"] = 0.0
-        if "added_date" not in df.columns: df["added_date"] = ""
-        if "source" not in df.columns: df["source"] = ""
-        df['id'] = df['id'].astype(str).str.replace(r'\.0$', '', regex=True)
-        return df
-    except: return pd.DataFrame()
+    try: return load_db_sheet()
+    except Exception:
+        import pandas as pd
+        return pd.DataFrame()  # Fehler steht bereits in den Messwerten (sheet:read)
+
+@st.cache_resource
+def get_sheet_db():
+    conn = gsheets_connection()
+    return SheetDB(GspreadSheet.from_connection(conn, SHEET_URL))
+
+@st.cache_resource
+def get_local_store():
+    return LocalStore(os.path.join(CACHE_DIR, "watchlist.sqlite"))
+
+@st.cache_resource
+def get_sheet_sync():
+    store, registry = get_local_store(), get_cache_registry()
+    sync = SheetSync(store, get_sheet_db(), on_change=lambda: registry.touch("db", sum(store.counts().values())))
+    # Beim allerersten Start muss der Store erst einmal gefüllt werden, danach läuft alles im Hintergrund
+    if store.meta("last_pull") is None: sync.sync()
+    return sync.start()
 
 def update_db_status(movie, new_status, origin="Unbekannt", user_rating=None):
-    conn = st.connection("gsheets", type=GSheetsConnection)
-    df = get_db_data()
-    m_id = str(movie['id']).replace('.0', '')
-    title = movie.get('title') or movie.get('name') or "Unbekannt"
-    today_str = datetime.now().strftime("%d.%m.%Y")
-
-    if m_id in df['id'].values:
-        if new_status == 'delete':
-            df = df[df['id'] != m_id]
-        else:
-            df.loc[df['id'] == m_id, 'status'] = new_status
-            if user_rating is not None:
-                df.loc[df['id'] == m_id, 'user_rating'] = float(user_rating)
-            if 'added_date' in df.columns and pd.isna(df.loc[df['id'] == m_id, 'added_date']).any():
-                 df.loc[df['id'] == m_id, 'added_date'] = today_str
-            if 'source' in df.columns and pd.isna(df.loc[df['id'] == m_id, 'source']).any():
-                 df.loc[df['id'] == m_id, 'source'] = origin
-    else:
-        if new_status != 'delete':
-            new_row = pd.DataFrame([{
-                "id": m_id, "title": title, "poster_path": movie.get('poster_path', ''),
-                "vote_average": movie.get('vote_average', 0), "status": new_status,
-                "added_date": today_str, "source": origin,
-                "user_rating": user_rating if user_rating else 0.0
-            }])
-            df = pd.concat([df, new_row], ignore_index=True)
-    conn.update(spreadsheet=SHEET_URL, data=df)
-    st.cache_data.clear()
+    # Schreiben geht in den lokalen Store (sofort sichtbar), das Sheet zieht der Hintergrund-Sync nach
+    try:
+        sync = get_sheet_sync()
+        sync.store.apply(movie, new_status, origin, user_rating)
+        sync.trigger()
+    except Exception:
+        # Letzter Ausweg wie früher: ganzes Blatt lesen, ändern und komplett hochladen
+        conn = gsheets_connection()
+        df = apply_status_to_frame(read_db_sheet(), movie, new_status, origin, user_rating)
+        conn.update(spreadsheet=SHEET_URL, data=df)
+        get_sheet_db.clear()
+        get_cache_registry().invalidate("db")
+
+def get_db_lists():
+    """(watchlist, seen_list) als Listen von Dicts – aus SQLite, nur im Notfall direkt aus dem Sheet."""
+    try:
+        store = get_sheet_sync().store
+        return store.records('watchlist'), store.records('seen')
+    except Exception:
+        db_df = get_db_data()
+        if db_df.empty: return [], []
+        return db_df[db_df['status'] == 'watchlist'].to_dict('records'), db_df[db_df['status'] == 'seen'].to_dict('records')
+
+def pull_sheet_now():
+    # Fehler landen in den Messwerten (sheet:sync) und einmal in der Seitenleiste (nächster Durchlauf)
+    try:
+        with METRICS.span("sheet", "sync"):
+            sync = get_sheet_sync()
+            sync.sync()
+        if sync.last_error: st.session_state['sync_error'] = sync.last_error
+    except Exception as e:
+        st.session_state['sync_error'] = f"{type(e).__name__}: {e}"
+
+# --- CACHE-BEREICHE ---
+# Leer-Funktionen als Lambdas: Registrieren allein erzeugt keinen Cache, Poster-Ordner oder Feed-Thread
+cache_registry = get_cache_registry()
+cache_registry.register("library", "📦 Bibliothek", [load_data_from_github.clear, get_library_matcher.clear, get_library_index.clear, get_library_links.clear])
+cache_registry.register("db", "📊 Datenbank", [load_db_sheet.clear, pull_sheet_now],
+                        size_fn=lambda: sum(get_local_store().counts().values()))
+cache_registry.register("tmdb", "🎬 TMDB", [lambda: get_tmdb_cache().clear(), lambda: get_shared_store().clear()], size_fn=lambda: get_tmdb_cache().summary()['disk_items'])
+cache_registry.register("posters", "🖼️ Poster", [lambda: get_poster_cache().clear()], size_fn=lambda: get_poster_cache().summary()['disk_items'])
+cache_registry.register("feeds", "📺 Feeds", [lambda: get_feed_ingester().refresh()])
+
+# --- REITER ---
+# Welche Daten ein Reiter braucht; geladen wird erst nach der Auswahl und nur das.
+# library: Excel-Sammlung mit Matcher und TMDB-Verknüpfungen, lists: Watchlist/Gesehen als Datensätze
+TAB_DATA = {
+    "Suche & Inspiration": {"library"},
+    "Entdecker-Modus ✨": {"library", "lists"},
+    "TV- und Mediatheken": set(),
+    "Lokale Liste": {"library"},
+    "Watchlist": {"lists"},
+    "Schon gesehen": {"lists"},
+}
 
 # --- 4. UI SEITENLEISTE ---
+METRICS.section("seitenleiste")
 st.sidebar.title("🛠️ Admin")
 if st.sidebar.button("🔄 Daten neu laden"):
-    st.cache_data.clear()
+    cache_registry.invalidate("library", "db", "feeds")
     st.rerun()
+with st.sidebar.expander("♻️ Caches"):
+    for scope in cache_registry.info():
+        c_info, c_btn = st.columns([3, 1])
+        size = scope['size'] if scope['size'] is not None else "–"
+        c_info.caption(f"{scope['label']}: {size} Einträge · Alter {format_age(scope['age'])}")
+        if c_btn.button("🔄", key=f"cache_clear_{scope['name']}"):
+            cache_registry.invalidate(scope['name'])
+            st.rerun()
 st.sidebar.link_button("📊 Datenbank öffnen", SHEET_URL)
-
-local_lib = load_data_from_github()
-db_df = get_db_data()
-watchlist = db_df[db_df['status'] == 'watchlist'].to_dict('records') if not db_df.empty else []
-seen_list = db_df[db_df['status'] == 'seen'].to_dict('records') if not db_df.empty else []
-
-menu = st.sidebar.radio("Speisekarte", [
-    "Suche & Inspiration", "Entdecker-Modus ✨", "TV- und Mediatheken", 
-    "Lokale Liste", f"Watchlist ({len(watchlist)})", f"Schon gesehen ({len(seen_list)})"
-])
+# Frischer Cache-Ordner: erst den ersten Pull abwarten, sonst stünden im Menü überall "(0)" (einmal je Session versuchen)
+if get_local_store().meta("last_pull") is None and not st.session_state.get('initial_pull_tried'):
+    st.session_state['initial_pull_tried'] = True
+    try: get_sheet_sync()
+    except Exception as e: st.session_state['sync_error'] = f"{type(e).__name__}: {e}"
+# Nur bei offenen Änderungen wird die Sheet-Verbindung aufgebaut (und damit der Hintergrund-Sync gestartet)
+pending = len(get_local_store().dirty())
+if pending:
+    try:
+        sheet_sync = get_sheet_sync()
+        if st.sidebar.button(f"💾 Jetzt synchronisieren ({pending} offen)"):
+            sheet_sync.sync()
+            st.rerun()
+        if sheet_sync.last_error: st.sidebar.caption(f"⚠️ Letzter Sync-Fehler: {sheet_sync.last_error}")
+    except Exception:
+        st.sidebar.caption("⚠️ Sheet nur lesbar, Änderungen werden direkt geschrieben.")
+sync_error = st.session_state.pop('sync_error', None)
+if sync_error: st.sidebar.caption(f"⚠️ Abgleich mit dem Sheet fehlgeschlagen: {sync_error}")
+with st.sidebar.expander("🗄️ TMDB-Cache"):
+    tmdb_stats = get_tmdb_cache().summary()
+    st.caption(f"Treffer: {tmdb_stats['memory']} RAM / {tmdb_stats['disk']} Platte · Fehlgriffe: {tmdb_stats['miss']} · Quote: {tmdb_stats['hit_rate']:.0%}")
+    st.caption(f"Einträge: {tmdb_stats['memory_items']} RAM / {tmdb_stats['disk_items']} Platte")
+    shared_stats = get_shared_store().summary()
+    st.caption(f"Geteilt: {shared_stats['items']} Ergebnisseiten · {shared_stats['hit']} wiederverwendet · {shared_stats['joined'] + tmdb_stats['joined']} Anfragen gebündelt")
+    poster_stats = get_poster_cache().summary()
+    st.caption(f"Poster: {poster_stats['disk_items']} Bilder · {poster_stats['disk_bytes'] / 2**20:.1f} MB · {poster_stats['fetched']} geladen · {poster_stats['memory'] + poster_stats['disk']} aus dem Cache")
+
+# Zahlen im Menü aus einem COUNT im lokalen Store (zwischengespeichert bis zur nächsten Änderung)
+db_counts = get_local_store().counts()
+menu_labels = {"Watchlist": db_counts.get('watchlist', 0), "Schon gesehen": db_counts.get('seen', 0)}
+menu = st.sidebar.radio("Speisekarte", list(TAB_DATA), key="menu",
+                        format_func=lambda t: f"{t} ({menu_labels[t]})" if t in menu_labels else t)
+show_metrics_panel()
+needs = TAB_DATA[menu]
+
+local_lib = local_matcher = local_links = None
+if "library" in needs:
+    METRICS.section("bibliothek")
+    local_lib = load_data_from_github()
+    local_matcher = get_library_matcher()
+    local_links = get_library_links()
+    with st.sidebar.expander("📦 Bibliothek"):
+        for r in local_lib.load_report:
+            name = r['url'].rsplit('/', 1)[-1]
+            if r['error']: st.caption(f"{name}: ❌ {r['error']}")
+            else: st.caption(f"{name}: {r['rows']} Titel · {r['source']} · {r['seconds']:.2f}s")
+        link_stats = local_links.progress()
+        st.caption(f"TMDB-Zuordnung: {link_stats['linked']} von {link_stats['rows']} verknüpft ({link_stats['done']} geprüft)")
+    for r in local_lib.load_report:
+        if r['error']: st.sidebar.warning(f"⚠️ {r['url'].rsplit('/', 1)[-1]} nicht geladen")
+        elif r['source'] == "veraltet": st.sidebar.warning(f"⚠️ {r['url'].rsplit('/', 1)[-1]}: GitHub nicht erreichbar, zeige den letzten Stand")
+
+watchlist, seen_list, own_ids = [], [], frozenset()
+if "lists" in needs:
+    METRICS.section("datenbank")
+    watchlist, seen_list = get_db_lists()
+    own_ids = frozenset(normalize_id(m['id']) for m in watchlist + seen_list)
+
+st.session_state['run_trace'].label = menu
+METRICS.section(f"tab {menu}")
 
 # --- TAB: SUCHE ---
 if menu == "Suche & Inspiration":
@@ -214,21 +504,17 @@ if menu == "Suche & Inspiration":
     
     if c_btn.button("🔍") or (search_input and search_input != st.session_state['search_query']):
         st.session_state['search_query'] = search_input
-        data = fetch_tmdb(f"{TMDB_BASE_URL}/search/multi?api_key={TMDB_API_KEY}&query={search_input}&language=de-DE")
-        results = data.get('results', [])
-        if results and results[0].get('media_type') == 'person':
-            person_id = results[0]['id']
-            st.toast(f"Lade Filme von: {results[0]['name']}")
-            res_movies = fetch_tmdb(f"{TMDB_BASE_URL}/discover/movie?api_key={TMDB_API_KEY}&with_cast={person_id}&sort_by=popularity.desc&language=de-DE")
-            st.session_state['search_results'] = res_movies.get('results', [])[:15]
-        else:
-            st.session_state['search_results'] = results[:15]
+        page = (resolved_search(search_input) if search_input else None) or {"person": None, "results": []}
+        if page['person']: st.toast(f"Lade Filme von: {page['person']}")
+        st.session_state['search_results'] = page['results']
 
+    local_hits = find_local_batch(st.session_state['search_results'], local_lib, local_links, local_matcher)
+    warm_posters(st.session_state['search_results'])
     for m in st.session_state['search_results']:
         title = m.get('title') or m.get('name')
         if not title: continue
         m_id = str(m['id']).replace('.0', '')
-        found = find_local_fuzzy(title, local_lib)
+        found = local_hits.get(m_id)
         
         # DATEN FÜR HEADER
         rating = round(m.get('vote_average', 0), 1)
@@ -241,11 +527,11 @@ if menu == "Suche & Inspiration":
         with st.expander(header):
             if found: st.success(f"✅ In deiner Sammlung: {found['path']}")
             c1, c2 = st.columns([1, 3])
-            if m.get('poster_path'): c1.image(f"{IMAGE_BASE_URL}{m.get('poster_path')}")
+            show_poster(c1, m.get('poster_path'))
             with c2:
                 st.write(m.get('overview'))
                 st.write("**Schauspieler:**")
-                credits = fetch_tmdb(f"{TMDB_BASE_URL}/{'movie' if 'title' in m else 'tv'}/{m_id}/credits?api_key={TMDB_API_KEY}")
+                credits = m.get('credits', {})
                 if credits.get('cast'):
                     cols = st.columns(4)
                     for i, actor in enumerate(credits['cast'][:4]):
@@ -267,10 +553,21 @@ if menu == "Suche & Inspiration":
 elif menu == "Entdecker-Modus ✨":
     st.header("✨ Entdecker-Modus")
     
+    explore_mode = st.radio("Modus:", ["🔍 Filter", "🎯 Für dich"], horizontal=True, label_visibility="collapsed")
+    for_you = explore_mode == "🎯 Für dich"
+    if for_you:
+        recommender = get_recommender()
+        recommender.ensure(seen_list)
+        rec_status = recommender.status()
+        rec_text = f"Basis: {rec_status['seen']} gesehene Titel · {rec_status['pool']} Kandidaten"
+        if rec_status['building']: rec_text += " · ⏳ wird aktualisiert"
+        if rec_status['error']: rec_text += f" · ⚠️ {rec_status['error']}"
+        st.caption(rec_text)
+
     with st.container(border=True):
         c1, c2, c3 = st.columns(3)
         with c1:
-            timeframe = st.selectbox("Zeitraum:", ["Alles", "✨ Brandneu (ab 2024)", "📅 Dieser Monat", "🔮 Nächster Monat"])
+            timeframe = st.selectbox("Zeitraum:", ["Alles", "✨ Brandneu (ab 2024)", "📅 Dieser Monat", "🔮 Nächster Monat"], disabled=for_you)
         with c2:
             genre_list = ["Beliebig"] + list(GENRE_MAP.values())
             selected_genre = st.selectbox("Genre:", genre_list)
@@ -278,7 +575,14 @@ elif menu == "Entdecker-Modus ✨":
             min_stars = st.slider("Mindestbewertung:", 0.0, 10.0, 7.0)
             m_type = st.radio("Format:", ["Filme", "Serien"], horizontal=True)
 
-    if st.button("🚀 Inspiration finden", use_container_width=True):
+    if for_you and st.button("🎯 Empfehlungen berechnen", use_container_width=True):
+        g_id = next((k for k, v in GENRE_MAP.items() if v == selected_genre), None)
+        ranked = recommender.rank(seen_list, own_ids, media="movie" if m_type == "Filme" else "tv", min_vote=min_stars, genre_id=g_id)
+        st.session_state['explore_results'] = [m for m, _ in ranked]
+        st.session_state['explore_stream'] = None
+        if not ranked: st.info("Noch keine Empfehlungen – bewerte ein paar gesehene Titel oder warte, bis der Kandidatenpool geladen ist.")
+
+    if not for_you and st.button("🚀 Inspiration finden", use_container_width=True):
         type_path = "movie" if m_type == "Filme" else "tv"
         
         genre_query = ""
@@ -309,20 +613,24 @@ elif menu == "Entdecker-Modus ✨":
             date_query = f"&{d_field}.gte={start_date.strftime('%Y-%m-%d')}&{d_field}.lte={end_date.strftime('%Y-%m-%d')}"
 
         url = f"{TMDB_BASE_URL}/discover/{type_path}?api_key={TMDB_API_KEY}&language=de-DE{genre_query}{date_query}&vote_average.gte={min_stars}&vote_count.gte=100&sort_by=popularity.desc"
-        st.session_state['explore_results'] = fetch_tmdb(url).get('results', [])[:15]
+        stream = new_discover_stream(url)
+        st.session_state['explore_stream'] = stream
+        st.session_state['explore_results'] = stream.next_batch(own_ids)
 
+    local_hits = find_local_batch(st.session_state.get('explore_results', []), local_lib, local_links, local_matcher)
+    warm_posters(st.session_state.get('explore_results', []))
     for m in st.session_state.get('explore_results', []):
         t = m.get('title') or m.get('name')
         m_id = str(m['id']).replace('.0', '')
-        found = find_local_fuzzy(t, local_lib)
+        found = local_hits.get(m_id)
         with st.expander(f"{'🟢 ' if found else ''}{t} ⭐ {m.get('vote_average')}"):
             if found: st.success(f"📂 Speicherort: {found['path']} ({found['type']})")
             c1, c2 = st.columns([1, 3])
-            if m.get('poster_path'): c1.image(f"{IMAGE_BASE_URL}{m.get('poster_path')}")
+            show_poster(c1, m.get('poster_path'))
             with c2:
                 st.write(m.get('overview'))
                 st.write("**Cast:**")
-                credits = fetch_tmdb(f"{TMDB_BASE_URL}/{'movie' if 'title' in m else 'tv'}/{m_id}/credits?api_key={TMDB_API_KEY}")
+                credits = m.get('credits', {})
                 if credits.get('cast'):
                     cols = st.columns(3)
                     for i, person in enumerate(credits['cast'][:6]):
@@ -338,86 +646,69 @@ elif menu == "Entdecker-Modus ✨":
                     update_db_status(m, 'seen', "Entdecker")
                     st.rerun()
 
+    stream = st.session_state['explore_stream']
+    if stream is not None and not for_you:
+        if not stream.exhausted and st.button("➕ Mehr laden", use_container_width=True):
+            st.session_state['explore_results'] = st.session_state['explore_results'] + stream.next_batch(own_ids)
+            st.rerun()
+        # Nächste Runde schon holen, während die aktuelle gelesen wird
+        stream.prefetch(own_ids)
+
 # --- TAB: TV & MEDIATHEK ---
 elif menu == "TV- und Mediatheken":
     st.header("📺 Live TV & Mediathek")
+    ingester = get_feed_ingester()
+
+    def feed_status(name):
+        s = ingester.status(name)
+        age = format_age(time.time() - s['checked_at']) if s['checked_at'] else "nie"
+        text = f"{s['items']} Einträge · {s['resolved']} bei TMDB gefunden · geprüft vor {age}"
+        if s['error']: text += f" · ⚠️ {s['error']}"
+        st.caption(text)
+
+    def feed_item(item, prefix, origin, icon):
+        details = item['details']
+        expander_title = f"{icon} {item['title']}"
+        if details: expander_title += f" | ⭐ {round(details.get('vote_average', 0), 1)}"
+        if details and origin == "Mediathek": expander_title += f" | {get_genres_string(details.get('genre_ids'))}"
+        with st.expander(expander_title):
+            if not details:
+                st.write(item['desc'])
+                return
+            c1, c2 = st.columns([1, 3])
+            show_poster(c1, details.get('poster_path'))
+            with c2:
+                if origin == "TV": st.caption(f"Genre: {get_genres_string(details.get('genre_ids'))}")
+                st.write(details.get('overview'))
+                st.markdown("---")
+                b1, b2 = st.columns(2)
+                if b1.button("🎫 Wunschliste", key=f"{prefix}_wl_{item['key']}"):
+                    update_db_status(details, 'watchlist', origin)
+                    st.toast("Gespeichert!")
+                if b2.button("✅ Gesehen", key=f"{prefix}_sn_{item['key']}"):
+                    update_db_status(details, 'seen', origin)
+                    st.toast("Markiert!")
+
     t1, t2 = st.tabs(["TV Programm", "Mediathek Tipps"])
     
     with t1:
         c_tv1, c_tv2 = st.columns(2)
-        if c_tv1.button("Heute 20:15", use_container_width=True):
-            st.session_state['tv_data'] = get_feed_items("https://www.tvspielfilm.de/tv-programm/rss/heute2015.xml", "TV")
-        if c_tv2.button("Heute 22:00", use_container_width=True):
-            st.session_state['tv_data'] = get_feed_items("https://www.tvspielfilm.de/tv-programm/rss/heute2200.xml", "TV")
-
-        for item in st.session_state['tv_data']:
-            item_hash = str(hash(item['title']))
-            details = st.session_state['tv_infos'].get(item_hash)
-            expander_title = f"⏰ {item['title']}"
-            if details: expander_title += f" | ⭐ {round(details.get('vote_average', 0), 1)}"
-            with st.expander(expander_title):
-                if details:
-                    c1, c2 = st.columns([1, 3])
-                    if details.get('poster_path'): c1.image(f"{IMAGE_BASE_URL}{details.get('poster_path')}")
-                    with c2:
-                        st.caption(f"Genre: {get_genres_string(details.get('genre_ids'))}")
-                        st.write(details.get('overview'))
-                        st.markdown("---")
-                        b1, b2 = st.columns(2)
-                        m_id = str(details['id'])
-                        if b1.button("🎫 Wunschliste", key=f"tv_wl_{m_id}"):
-                            update_db_status(details, 'watchlist', "TV")
-                            st.toast("Gespeichert!")
-                        if b2.button("✅ Gesehen", key=f"tv_sn_{m_id}"):
-                            update_db_status(details, 'seen', "TV")
-                            st.toast("Markiert!")
-                else:
-                    st.write(item['desc'])
-                    if st.button("ℹ️ Infos laden", key=f"tv_load_{item_hash}"):
-                        clean_name = item['title'].split('|')[-1].strip()
-                        res = fetch_tmdb(f"{TMDB_BASE_URL}/search/multi?api_key={TMDB_API_KEY}&query={clean_name}&language=de-DE")
-                        if res.get('results'):
-                            st.session_state['tv_infos'][item_hash] = res['results'][0]
-                            st.rerun()
+        if c_tv1.button("Heute 20:15", use_container_width=True): st.session_state['tv_feed'] = "tv2015"
+        if c_tv2.button("Heute 22:00", use_container_width=True): st.session_state['tv_feed'] = "tv2200"
+        tv_items = ingester.items(st.session_state['tv_feed'])
+        feed_status(st.session_state['tv_feed'])
+        warm_posters([it['details'] for it in tv_items if it['details']])
+        for item in tv_items: feed_item(item, "tv", "TV", "⏰")
 
     with t2:
-        if st.button("Mediathek Tipps laden", use_container_width=True):
-            st.session_state['mediathek_data'] = get_feed_items("https://www.filmdienst.de/rss/mediatheken", "Mediathek")
-        
-        for item in st.session_state['mediathek_data']:
-            item_hash = str(hash(item['title'] + "med"))
-            details = st.session_state['tv_infos'].get(item_hash)
-            expander_title = f"▶️ {item['title']}"
-            if details: 
-                expander_title += f" | ⭐ {round(details.get('vote_average', 0), 1)} | {get_genres_string(details.get('genre_ids'))}"
-
-            with st.expander(expander_title):
-                if details:
-                    c1, c2 = st.columns([1, 3])
-                    if details.get('poster_path'): c1.image(f"{IMAGE_BASE_URL}{details.get('poster_path')}")
-                    with c2:
-                        st.write(details.get('overview'))
-                        st.markdown("---")
-                        b1, b2 = st.columns(2)
-                        m_id = str(details['id'])
-                        if b1.button("🎫 Wunschliste", key=f"med_wl_{m_id}"):
-                            update_db_status(details, 'watchlist', "Mediathek")
-                            st.toast("Gespeichert!")
-                        if b2.button("✅ Gesehen", key=f"med_sn_{m_id}"):
-                            update_db_status(details, 'seen', "Mediathek")
-                            st.toast("Markiert!")
-                else:
-                    st.write(item['desc'])
-                    if st.button("ℹ️ Infos laden", key=f"med_load_{item_hash}"):
-                        clean = item['title'].replace("Film:", "").replace("Serie:", "").strip()
-                        res = fetch_tmdb(f"{TMDB_BASE_URL}/search/multi?api_key={TMDB_API_KEY}&query={clean}&language=de-DE")
-                        if res.get('results'):
-                            st.session_state['tv_infos'][item_hash] = res['results'][0]
-                            st.rerun()
+        med_items = ingester.items("mediathek")
+        feed_status("mediathek")
+        warm_posters([it['details'] for it in med_items if it['details']])
+        for item in med_items: feed_item(item, "med", "Mediathek", "▶️")
 
 # --- TAB: WATCHLIST & GESEHEN ---
-elif "Watchlist" in menu or "Schon gesehen" in menu:
-    is_seen = "Schon gesehen" in menu
+elif menu in ("Watchlist", "Schon gesehen"):
+    is_seen = menu == "Schon gesehen"
     target = seen_list if is_seen else watchlist
     st.header("✅ Gesehen" if is_seen else "🎫 Watchlist")
     
@@ -426,7 +717,9 @@ elif "Watchlist" in menu or "Schon gesehen" in menu:
     elif sort_mode == "Bewertung (Hoch zuerst)": target.sort(key=lambda x: float(x.get('vote_average', 0)), reverse=True)
     else: target.reverse()
 
-    for i, m in enumerate(target):
+    offset, page_items = paginate(target, "seen_page" if is_seen else "wl_page")
+    warm_posters(page_items)
+    for i, m in enumerate(page_items, start=offset):
         m_id = str(m['id']).replace('.0', '')
         u_rating = float(m.get('user_rating', 0.0))
         added = m.get('added_date', 'Unbekannt')
@@ -442,7 +735,7 @@ elif "Watchlist" in menu or "Schon gesehen" in menu:
         
         with st.expander(title_str):
             c1, c2 = st.columns([1, 4])
-            if m.get('poster_path'): c1.image(f"{IMAGE_BASE_URL}{m.get('poster_path')}", width=100)
+            show_poster(c1, m.get('poster_path'), "thumb", width=100)
             with c2:
                 if not is_seen: st.caption(f"Hinzugefügt: {added} | Via: {source}")
                 st.write(m.get('overview'))
@@ -466,20 +759,21 @@ elif "Watchlist" in menu or "Schon gesehen" in menu:
 # --- TAB: LOKALE LISTE ---
 elif menu == "Lokale Liste":
     st.header("📂 Deine GitHub Sammlung")
-    term = st.text_input("🔎 Lokale Suche:", placeholder="Titel, Schauspieler eingeben...")
+    term = st.text_input("🔎 Lokale Suche:", placeholder="Titel, Schauspieler, Genre, Handlung... (z.B. actor:Law genre:krimi type:Serie)")
     
     if local_lib:
-        df = pd.DataFrame(local_lib.values())
+        df = local_lib.df
         if not df.empty:
+            # Index statt str.contains über alle Zeilen: Treffer nach Relevanz, Umlaute egal
+            if term: df = get_library_index().search_frame(term)
+            # Erst den sichtbaren Ausschnitt bilden, dann umbenennen -> nur diese Zeilen gehen an den Browser
+            _, df = paginate(df, "local_page", sizes=(50, 100, 250, 500), default=100)
             cols_to_show = ['title', 'type', 'path', 'genre', 'actors', 'plot']
             available_cols = [c for c in cols_to_show if c in df.columns]
-            df = df[available_cols]
             rename_map = {"title": "Titel", "type": "Typ", "path": "Ablageort", "genre": "Genre", "actors": "Schauspieler", "plot": "Handlung"}
-            df = df.rename(columns=rename_map)
-            
-            if term: 
-                df = df[
-                    df['Titel'].str.contains(term, case=False) | 
-                    df['Schauspieler'].str.contains(term, case=False)
-                ]
+            df = df[available_cols].rename(columns=rename_map)
             st.dataframe(df, use_container_width=True, hide_index=True)
+
+# --- MESSUNG ABSCHLIESSEN ---
+st.session_state['last_trace'] = METRICS.finish_run(st.session_state['run_trace'])
+if METRICS_PROM_PATH: METRICS.write_prometheus(METRICS_PROM_PATH)
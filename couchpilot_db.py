@@ -0,0 +1,469 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from couchpilot_metrics import METRICS
+
+DB_COLUMNS = ["id", "title", "poster_path", "vote_average", "status", "added_date", "source", "user_rating"]
+
+def normalize_id(value):
+    return re.sub(r'\.0$', '', str(value).strip())
+
+def today_str():
+    return datetime.now().strftime("%d.%m.%Y")
+
+def new_db_row(movie, new_status, origin, user_rating, today):
+    return {
+        "id": normalize_id(movie['id']), "title": movie.get('title') or movie.get('name') or "Unbekannt",
+        "poster_path": movie.get('poster_path', ''), "vote_average": movie.get('vote_average', 0),
+        "status": new_status, "added_date": today, "source": origin,
+        "user_rating": user_rating if user_rating else 0.0
+    }
+
+def apply_status_to_frame(df, movie, new_status, origin="Unbekannt", user_rating=None, today=None):
+    """Die bisherige Logik von update_db_status auf einem kompletten DataFrame (Fallback-Pfad)."""
+    import pandas as pd  # nur für die DataFrame-Pfade; LocalStore/SheetSync kommen ohne pandas aus
+    today = today or today_str()
+    m_id = normalize_id(movie['id'])
+    if df.empty or 'id' not in df.columns: df = pd.DataFrame(columns=DB_COLUMNS)
+    df = df.astype(object)  # Sheet-Spalten können reine String-Spalten sein, Bewertungen sind Zahlen
+    df['id'] = df['id'].astype(str).map(normalize_id)
+
+    if m_id in df['id'].values:
+        if new_status == 'delete':
+            return df[df['id'] != m_id]
+        mask = df['id'] == m_id
+        df.loc[mask, 'status'] = new_status
+        if user_rating is not None:
+            if 'user_rating' not in df.columns: df['user_rating'] = 0.0
+            df.loc[mask, 'user_rating'] = float(user_rating)
+        for col, fill in (('added_date', today), ('source', origin)):
+            if col in df.columns:
+                empty = mask & (df[col].isna() | (df[col].astype(str) == ""))
+                df.loc[empty, col] = fill
+    elif new_status != 'delete':
+        df = pd.concat([df, pd.DataFrame([new_db_row(movie, new_status, origin, user_rating, today)])], ignore_index=True)
+    return df
+
+# --- SHEET BACKENDS ---
+class GspreadSheet:
+    """Dünne Hülle um ein gspread-Worksheet. Zeilen und Spalten zählen ab 1, Zeile 1 ist der Kopf."""
+
+    def __init__(self, worksheet):
+        self.ws = worksheet
+
+    @classmethod
+    def from_connection(cls, conn, spreadsheet):
+        # GSheetsConnection bietet keine Zeilen-API; das gspread-Worksheet steckt im Service-Account-Client
+        return cls(conn.client._select_worksheet(spreadsheet=spreadsheet))
+
+    def get_all_values(self):
+        return self.ws.get_all_values()
+
+    def cell(self, row, col):
+        return self.ws.cell(row, col).value
+
+    def col_values(self, col):
+        return self.ws.col_values(col)
+
+    def append_row(self, values):
+        self.ws.append_row(values, value_input_option="USER_ENTERED")
+
+    def update_cells(self, row, values_by_col):
+        from gspread.utils import rowcol_to_a1
+        self.ws.batch_update([{"range": rowcol_to_a1(row, col), "values": [[v]]} for col, v in values_by_col.items()],
+                             value_input_option="USER_ENTERED")
+
+    def delete_row(self, row):
+        self.ws.delete_rows(row)
+
+    def rewrite(self, rows):
+        self.ws.clear()
+        self.ws.update(rows, value_input_option="USER_ENTERED")
+
+def frame_from_rows(rows):
+    import pandas as pd
+    if not rows: return pd.DataFrame(columns=DB_COLUMNS)
+    return pd.DataFrame(rows[1:], columns=rows[0]).replace("", pd.NA)
+
+def rows_from_frame(df):
+    df = df.astype(object).where(df.notna(), "")
+    return [list(df.columns)] + df.values.tolist()
+
+# --- INKREMENTELLE SCHREIBZUGRIFFE ---
+class SheetMismatch(Exception):
+    """Das Blatt passt nicht zum zeilenweisen Schreiben (Spalten fehlen, Zeile gehört nicht zur id)."""
+
+class SheetDB:
+    """Schreibt Statusänderungen zeilenweise ins Sheet statt es jedes Mal komplett neu hochzuladen.
+
+    Hält einen Index id -> Zeilennummer(n). Vor jedem Schreiben wird billig geprüft, ob der
+    Index noch stimmt (id in der Zielzeile bzw. die id-Spalte vor dem Anhängen); wurde das
+    Sheet extern geändert, wird der Index neu gebaut.
+    Passt das Blatt strukturell nicht (SheetMismatch), wird wie früher das ganze Blatt neu
+    geschrieben; andere Fehler (Quota, Timeout, Verbindung) gehen an den Aufrufer zurück, damit
+    SheetSync es später erneut versucht, statt das Blatt zu leeren und neu aufzubauen.
+    """
+
+    def __init__(self, sheet):
+        self.sheet = sheet
+        self._lock = threading.Lock()
+        self._header = None
+        self._index = None
+        self._values = None
+        self._row_count = 0
+
+    def invalidate(self):
+        self._header = self._index = self._values = None
+
+    def refresh(self):
+        """Liest das ganze Blatt einmal, baut den Index neu und liefert die Zeilen (für den Abgleich)."""
+        with self._lock:
+            return self._load()
+
+    def _load(self):
+        rows = self.sheet.get_all_values()
+        self._header = rows[0] if rows else []
+        self._row_count = len(rows)
+        self._index, self._values = {}, {}
+        if "id" not in self._header: return rows
+        id_col = self._header.index("id")
+        for row_no, values in enumerate(rows[1:], start=2):
+            if id_col < len(values) and values[id_col] != "":
+                self._index.setdefault(normalize_id(values[id_col]), []).append(row_no)
+                self._values[row_no] = values
+        return rows
+
+    def _col(self, name):
+        return self._header.index(name) + 1
+
+    def _rows_for(self, m_id):
+        if self._index is None: self._load()
+        if "id" not in self._header: return []
+        rows = self._index.get(m_id, [])
+        # Stimmt der Index noch? Sonst hat jemand das Sheet direkt bearbeitet
+        if rows:
+            fresh = normalize_id(self.sheet.cell(rows[0], self._col("id"))) == m_id
+        else:
+            ids = self.sheet.col_values(self._col("id"))
+            fresh = len(ids) <= self._row_count and m_id not in {normalize_id(i) for i in ids[1:]}
+        if not fresh:
+            self._load()
+            rows = self._index.get(m_id, [])
+        return rows
+
+    def _value(self, row_no, name):
+        values = self._values.get(row_no, [])
+        pos = self._header.index(name)
+        return values[pos] if pos < len(values) else ""
+
+    def apply(self, movie, new_status, origin="Unbekannt", user_rating=None, today=None):
+        """Liefert 'incremental' oder 'rewrite', je nachdem welcher Weg geschrieben hat."""
+        today = today or today_str()
+        with self._lock:
+            try:
+                self._apply_incremental(movie, new_status, origin, user_rating, today)
+                return "incremental"
+            except SheetMismatch:
+                self.invalidate()
+                self._apply_rewrite(movie, new_status, origin, user_rating, today)
+                return "rewrite"
+            except Exception:
+                self.invalidate()  # nach einem halben Schreibvorgang ist der Index nicht mehr verlässlich
+                raise
+
+    def _apply_incremental(self, movie, new_status, origin, user_rating, today):
+        m_id = normalize_id(movie['id'])
+        rows = self._rows_for(m_id)
+        if any(c not in self._header for c in DB_COLUMNS):
+            raise SheetMismatch("Spalten fehlen im Sheet")
+
+        if new_status == 'delete':
+            # Von unten nach oben löschen, damit die Nummern der übrigen Zeilen stimmen
+            for row_no in sorted(rows, reverse=True):
+                self.sheet.delete_row(row_no)
+                self._shift_after_delete(row_no)
+            return
+
+        if not rows:
+            row = new_db_row(movie, new_status, origin, user_rating, today)
+            values = [row.get(c, "") for c in self._header]
+            self.sheet.append_row(values)
+            self._row_count += 1
+            row_no = self._row_count
+            self._index[m_id] = [row_no]
+            self._values[row_no] = [str(v) for v in values]
+            return
+
+        for row_no in rows:
+            if row_no not in self._values or row_no > self._row_count: raise SheetMismatch(f"Zeile {row_no} passt nicht zu id {m_id}")
+            changes = {self._col("status"): new_status}
+            if user_rating is not None: changes[self._col("user_rating")] = float(user_rating)
+            if self._value(row_no, "added_date") == "": changes[self._col("added_date")] = today
+            if self._value(row_no, "source") == "": changes[self._col("source")] = origin
+            self.sheet.update_cells(row_no, changes)
+            values = self._values[row_no]
+            for col, v in changes.items():
+                values.extend([""] * (col - len(values)))
+                values[col - 1] = str(v)
+
+    def _shift_after_delete(self, deleted):
+        self._row_count -= 1
+        self._values = {(r - 1 if r > deleted else r): v for r, v in self._values.items() if r != deleted}
+        for m_id in list(self._index):
+            rows = [r - 1 if r > deleted else r for r in self._index[m_id] if r != deleted]
+            if rows: self._index[m_id] = rows
+            else: del self._index[m_id]
+
+    def _apply_rewrite(self, movie, new_status, origin, user_rating, today):
+        df = apply_status_to_frame(frame_from_rows(self.sheet.get_all_values()), movie, new_status, origin, user_rating, today)
+        self.sheet.rewrite(rows_from_frame(df))
+
+# --- LOKALER STORE (SQLITE) ---
+STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id TEXT PRIMARY KEY, title TEXT, poster_path TEXT, vote_average REAL, status TEXT,
+    added_date TEXT, source TEXT, user_rating REAL,
+    seq INTEGER,              -- Reihenfolge wie im Sheet (Hinzugefügt)
+    deleted INTEGER DEFAULT 0,  -- lokal gelöscht, Löschung noch nicht im Sheet
+    updated_at REAL,          -- letzte lokale Änderung
+    synced_at REAL,           -- letzter Abgleich mit dem Sheet; updated_at > synced_at = noch hochzuladen
+    in_sheet INTEGER DEFAULT 0, sheet_hash TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_items_status ON items (status, deleted, seq);
+CREATE INDEX IF NOT EXISTS idx_items_added ON items (added_date);
+CREATE INDEX IF NOT EXISTS idx_items_dirty ON items (updated_at, synced_at);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+RECORD_FIELDS = DB_COLUMNS
+
+def to_float(value, default=0.0):
+    try: return float(str(value).replace(",", ".")) if value not in (None, "") else default
+    except ValueError: return default
+
+def row_hash(values):
+    return hashlib.sha1(json.dumps([str(values.get(c, "")) for c in DB_COLUMNS]).encode("utf-8")).hexdigest()
+
+class LocalStore:
+    """Watchlist/Gesehen-Datenbank in SQLite. Die App liest und schreibt nur hier;
+    das Google Sheet wird von SheetSync im Hintergrund als Replik nachgezogen."""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(STORE_SCHEMA)
+        self._lock = threading.Lock()
+        self.version = 0  # steigt bei jeder Änderung, z.B. als Cache-Schlüssel für Ansichten
+        self._counts = None
+
+    # --- Lesen ---
+    def records(self, status):
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {', '.join(RECORD_FIELDS)} FROM items WHERE status = ? AND deleted = 0 ORDER BY seq", (status,)
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def counts(self):
+        """Einträge je Status; bis zur nächsten Änderung (version) aus dem Speicher – für Menü und Seitenleiste."""
+        with self._lock:
+            if self._counts is None or self._counts[0] != self.version:
+                rows = self._db.execute("SELECT status, COUNT(*) FROM items WHERE deleted = 0 GROUP BY status").fetchall()
+                self._counts = (self.version, {status: n for status, n in rows})
+            return dict(self._counts[1])
+
+    def meta(self, key, default=None):
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def dirty(self):
+        with self._lock:
+            return [dict(r) for r in self._db.execute("SELECT * FROM items WHERE updated_at > COALESCE(synced_at, 0) ORDER BY seq")]
+
+    # --- Schreiben (lokal, sofort) ---
+    def apply(self, movie, new_status, origin="Unbekannt", user_rating=None, today=None):
+        """Gleiche Regeln wie apply_status_to_frame, nur als eine Zeile in SQLite."""
+        today = today or today_str()
+        m_id = normalize_id(movie['id'])
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT * FROM items WHERE id = ?", (m_id,)).fetchone()
+            if new_status == 'delete':
+                if row: self._db.execute("UPDATE items SET deleted = 1, updated_at = ? WHERE id = ?", (now, m_id))
+            elif row and not row["deleted"]:
+                self._db.execute(
+                    "UPDATE items SET status = ?, user_rating = COALESCE(?, user_rating), "
+                    "added_date = COALESCE(NULLIF(added_date, ''), ?), source = COALESCE(NULLIF(source, ''), ?), "
+                    "updated_at = ? WHERE id = ?",
+                    (new_status, float(user_rating) if user_rating is not None else None, today, origin, now, m_id))
+            else:
+                # Neu (oder lokal gelöscht und wieder hinzugefügt): frische Zeile ans Ende
+                values = new_db_row(movie, new_status, origin, user_rating, today)
+                seq = self._db.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM items").fetchone()[0]
+                self._db.execute(
+                    "INSERT OR REPLACE INTO items (id, title, poster_path, vote_average, status, added_date, source, "
+                    "user_rating, seq, deleted, updated_at, synced_at, in_sheet, sheet_hash) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0, ?, ?, ?, ?)",
+                    (m_id, values["title"], values["poster_path"] or "", to_float(values["vote_average"]), new_status,
+                     today, origin, to_float(values["user_rating"]), seq, now,
+                     row["synced_at"] if row else None, row["in_sheet"] if row else 0, row["sheet_hash"] if row else None))
+            self._db.commit()
+            self.version += 1
+
+    # --- Abgleich ---
+    def mark_pushed(self, m_id, pushed_at, deleted):
+        """Nach erfolgreichem Upload: als synchron markieren, sofern seitdem nicht erneut geändert."""
+        with self._lock:
+            if deleted:
+                self._db.execute("DELETE FROM items WHERE id = ? AND updated_at <= ?", (m_id, pushed_at))
+            else:
+                self._db.execute("UPDATE items SET synced_at = updated_at, in_sheet = 1 WHERE id = ? AND updated_at <= ?",
+                                 (m_id, pushed_at))
+            self._db.commit()
+            self.version += 1
+
+    def merge_sheet(self, rows):
+        """Übernimmt den Stand des Sheets für alle lokal unveränderten Zeilen.
+
+        Lokal noch nicht hochgeladene Änderungen gewinnen (sie sind jünger als der letzte Abgleich).
+        Zeilen, die im Sheet verschwunden sind und lokal unverändert waren, werden gelöscht.
+        Liefert die Anzahl geänderter lokaler Zeilen.
+        """
+        if not rows or "id" not in rows[0]: return 0
+        header, now, changed = rows[0], time.time(), 0
+        sheet = {}
+        for values in rows[1:]:
+            rec = dict(zip(header, values))
+            m_id = normalize_id(rec.get("id", ""))
+            if m_id and m_id not in sheet: sheet[m_id] = rec
+        with self._lock:
+            local = {r["id"]: r for r in self._db.execute("SELECT * FROM items")}
+            for seq, (m_id, rec) in enumerate(sheet.items(), start=1):
+                h = row_hash(rec)
+                row = local.get(m_id)
+                is_dirty = row is not None and (row["updated_at"] or 0) > (row["synced_at"] or 0)
+                if is_dirty:
+                    self._db.execute("UPDATE items SET in_sheet = 1 WHERE id = ?", (m_id,))
+                    continue
+                if row is not None and row["sheet_hash"] == h and row["seq"] == seq: continue
+                self._db.execute(
+                    "INSERT OR REPLACE INTO items (id, title, poster_path, vote_average, status, added_date, source, "
+                    "user_rating, seq, deleted, updated_at, synced_at, in_sheet, sheet_hash) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0, ?, ?, 1, ?)",
+                    (m_id, rec.get("title", ""), rec.get("poster_path", ""), to_float(rec.get("vote_average")),
+                     rec.get("status", ""), rec.get("added_date", ""), rec.get("source", ""),
+                     to_float(rec.get("user_rating")), seq, now, now, h))
+                changed += 1
+            for m_id, row in local.items():
+                if m_id in sheet: continue
+                is_dirty = (row["updated_at"] or 0) > (row["synced_at"] or 0)
+                if not is_dirty and (row["in_sheet"] or row["deleted"]):
+                    self._db.execute("DELETE FROM items WHERE id = ?", (m_id,))
+                    changed += 1
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('last_pull', ?)", (str(now),))
+            self._db.commit()
+            if changed: self.version += 1
+        return changed
+
+# --- HINTERGRUND-ABGLEICH ---
+class SheetSync:
+    """Gleicht LocalStore und Google Sheet in beide Richtungen ab.
+
+    push: lokale Änderungen (updated_at > synced_at) zeilenweise über SheetDB hochladen.
+    pull: ganzes Blatt lesen und in den Store übernehmen (siehe LocalStore.merge_sheet).
+    Ein Hintergrund-Thread pusht kurz nach jeder Änderung (trigger) und zieht regelmäßig.
+    """
+
+    def __init__(self, store, sheet_db, push_delay=3.0, pull_interval=300.0, retry_delay=5.0, on_change=None):
+        self.store = store
+        self.sheet_db = sheet_db
+        self.push_delay = push_delay
+        self.pull_interval = pull_interval
+        self.retry_delay = retry_delay
+        self.on_change = on_change
+        self.last_error = None
+        self._wake = threading.Event()
+        self._push_due = None
+        self._pull_due = 0.0
+        self._run_lock = threading.Lock()
+        self._thread = None
+
+    def push(self):
+        with METRICS.span("sheet", "push"): return self._push()
+
+    def _push(self):
+        done, error = 0, None
+        for row in self.store.dirty():
+            try:
+                if row["deleted"]:
+                    if row["in_sheet"]: self.sheet_db.apply({"id": row["id"]}, "delete")
+                else:
+                    self.sheet_db.apply(row, row["status"], row["source"] or "Unbekannt", row["user_rating"], row["added_date"] or None)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                continue
+            self.store.mark_pushed(row["id"], row["updated_at"], bool(row["deleted"]))
+            done += 1
+        self.last_error = error
+        return done
+
+    def pull(self):
+        with METRICS.span("sheet", "pull"): changed = self.store.merge_sheet(self.sheet_db.refresh())
+        if changed and self.on_change: self.on_change()
+        return changed
+
+    def sync(self):
+        """Ein vollständiger Durchlauf: erst hochladen, dann den Stand des Sheets übernehmen."""
+        with self._run_lock:
+            self.push()
+            try:
+                self.pull()
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+            self._pull_due = time.time() + self.pull_interval
+
+    def trigger(self, delay=None):
+        self._push_due = time.time() + (self.push_delay if delay is None else delay)
+        self._wake.set()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="sheet-sync", daemon=True)
+            self._thread.start()
+        return self
+
+    def _loop(self):
+        failures = 0
+        while True:
+            try:
+                if self._step(): failures = 0
+            except Exception as e:
+                # Der Thread darf nicht sterben, sonst ruht der Abgleich bis zum Neustart -> merken, später neu versuchen
+                self.last_error = f"{type(e).__name__}: {e}"
+                retry = time.time() + min(self.retry_delay * 2 ** failures, self.pull_interval)
+                failures += 1
+                self._push_due = retry
+                self._pull_due = max(self._pull_due, retry)
+
+    def _step(self):
+        """Wartet bis zum nächsten fälligen Push/Pull oder führt ihn aus; True, wenn gearbeitet wurde."""
+        now = time.time()
+        due = min(d for d in (self._push_due, self._pull_due) if d is not None)
+        if due > now:
+            self._wake.wait(due - now)
+            self._wake.clear()
+            return False
+        if self._push_due is not None and self._push_due <= now:
+            self._push_due = None
+            with self._run_lock:
+                self.push()
+            if self.store.dirty(): self._push_due = time.time() + 30  # später erneut versuchen
+        if self._pull_due <= time.time(): self.sync()
+        return True
@@ -0,0 +1,147 @@
+import hashlib
+import html
+import json
+import os
+import re
+import threading
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from couchpilot_metrics import METRICS
+
+# --- PARSEN ---
+def clean_html(raw_text):
+    if not raw_text: return ""
+    return re.sub(r'<[^>]+>', '', html.unescape(raw_text)).strip()
+
+def search_title(title, tag):
+    """Suchbegriff für TMDB: '20:15 | ZDF | Tatort' -> 'Tatort', 'Film: Heat' -> 'Heat'."""
+    if tag == "TV": return title.split('|')[-1].strip()
+    return title.replace("Film:", "").replace("Serie:", "").strip()
+
+def item_key(title, tag):
+    return hashlib.sha1(f"{tag}|{title}".encode("utf-8")).hexdigest()[:16]
+
+def iter_feed_items(stream, tag):
+    """Liest <item>-Einträge eines RSS-Streams nacheinander mit iterparse und gibt jeden sofort wieder frei."""
+    for _, elem in ET.iterparse(stream, events=("end",)):
+        if elem.tag != "item": continue
+        title = (elem.findtext("title") or "").strip()
+        if title:
+            yield {"key": item_key(title, tag), "title": title, "desc": clean_html(elem.findtext("description")),
+                   "tag": tag, "query": search_title(title, tag), "details": None}
+        elem.clear()
+
+# --- INGESTER ---
+class FeedIngester:
+    """Holt die TV-/Mediathek-Feeds im Hintergrund und ordnet allen Einträgen vorab einen TMDB-Treffer zu.
+
+    Abgefragt wird mit If-None-Match/If-Modified-Since; bei 304 bleibt der Stand, nur noch offene
+    Zuordnungen werden nachgeholt. Der letzte Stand liegt als JSON auf der Platte, damit nach einem
+    Neustart sofort etwas angezeigt wird und die Bedingungen weiter greifen.
+    """
+
+    def __init__(self, feeds, resolve, path, session=None, interval=900.0, timeout=10, max_workers=8, on_change=None):
+        self.feeds = feeds  # {name: (url, tag)}
+        self.resolve = resolve
+        self.path = path
+        self.session = session
+        self.interval = interval
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.on_change = on_change
+        self._lock = threading.Lock()
+        self._poll_locks = {name: threading.Lock() for name in feeds}
+        self._wake = threading.Event()
+        self._thread = None
+        self._state = {name: {"items": [], "etag": None, "last_modified": None, "fetched_at": None,
+                              "checked_at": None, "error": None} for name in feeds}
+        try:
+            with open(path, encoding="utf-8") as f: saved = json.load(f)
+            for name, state in saved.items():
+                if name in self._state and state.get("url") == feeds[name][0]: self._state[name].update(state)
+        except (OSError, ValueError):
+            pass
+
+    def _save(self):
+        with self._lock:
+            data = {name: {**s, "url": self.feeds[name][0]} for name, s in self._state.items()}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f: json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def _resolve_all(self, items):
+        todo = [it for it in items if it["details"] is None and it["query"]]
+        if not todo: return 0
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(todo))) as pool:
+            for it, details in zip(todo, pool.map(lambda it: self.resolve(it["query"]), todo)):
+                it["details"] = details or None
+        return sum(1 for it in todo if it["details"])
+
+    def poll(self, name):
+        """Einen Feed abfragen. Liefert 'neu', 'unverändert' oder 'fehler'."""
+        url, tag = self.feeds[name]
+        with self._poll_locks[name]:
+            with self._lock: state = dict(self._state[name])
+            headers = {'User-Agent': 'Mozilla/5.0'}
+            if state["items"] and state["etag"]: headers["If-None-Match"] = state["etag"]
+            if state["items"] and state["last_modified"]: headers["If-Modified-Since"] = state["last_modified"]
+            t0 = time.perf_counter()
+            try:
+                with (self.session or requests).get(url, headers=headers, timeout=self.timeout, stream=True) as resp:
+                    if resp.status_code == 304:
+                        items, result = [dict(it) for it in state["items"]], "unverändert"
+                    else:
+                        resp.raise_for_status()
+                        resp.raw.decode_content = True
+                        items, result = list(iter_feed_items(resp.raw, tag)), "neu"
+                        state.update(etag=resp.headers.get("ETag"), last_modified=resp.headers.get("Last-Modified"), fetched_at=time.time())
+                    METRICS.record("feed", name, time.perf_counter() - t0, resp.raw.tell() if result == "neu" else 0,
+                                   "304" if result == "unverändert" else "miss", start=t0)
+            except (requests.RequestException, ET.ParseError) as e:
+                METRICS.record("feed", name, time.perf_counter() - t0, error=type(e).__name__, start=t0)
+                with self._lock: self._state[name].update(error=f"{type(e).__name__}: {e}", checked_at=time.time())
+                return "fehler"
+            resolved = self._resolve_all(items)
+            state.update(items=items, checked_at=time.time(), error=None)
+            with self._lock: self._state[name] = state
+        if result == "neu" or resolved: self._save()
+        if result == "neu" and self.on_change: self.on_change()
+        return result
+
+    def poll_all(self):
+        with ThreadPoolExecutor(max_workers=len(self.feeds)) as pool:
+            return dict(zip(self.feeds, pool.map(self.poll, self.feeds)))
+
+    def items(self, name, wait=True):
+        """Einträge eines Feeds; beim allerersten Aufruf ohne gespeicherten Stand wird direkt geladen."""
+        with self._lock: state = self._state[name]
+        if wait and state["checked_at"] is None and not state["items"]: self.poll(name)
+        with self._lock: return list(self._state[name]["items"])
+
+    def status(self, name):
+        with self._lock:
+            s = self._state[name]
+            return {"items": len(s["items"]), "resolved": sum(1 for it in s["items"] if it["details"]),
+                    "fetched_at": s["fetched_at"], "checked_at": s["checked_at"], "error": s["error"]}
+
+    def total_items(self):
+        with self._lock: return sum(len(s["items"]) for s in self._state.values())
+
+    def refresh(self):
+        """Nächsten Durchlauf sofort starten (ohne Bedingungen zu verwerfen)."""
+        self._wake.set()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="feed-ingester", daemon=True)
+            self._thread.start()
+        return self
+
+    def _loop(self):
+        while True:
+            self.poll_all()
+            self._wake.wait(self.interval)
+            self._wake.clear()
@@ -0,0 +1,556 @@
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import requests
+from rapidfuzz import process, fuzz
+from couchpilot_metrics import METRICS
+
+# --- EXCEL SPALTEN ---
+# Feld -> mögliche Spaltennamen (klein geschrieben) in den Excel-Listen
+COLUMN_ALIASES = {
+    "title": ["titel", "name", "filmtitel"],
+    "genre": ["genre", "genres"],
+    "actors": ["schauspieler", "darsteller", "cast"],
+    "plot": ["handlung", "inhalt", "plot", "beschreibung"],
+    "year": ["jahr", "year"],
+    "original_title": ["originaltitel", "original_title"],
+    "imdb_id": ["imdbid", "imdb_id", "imdb"],
+    "tmdb_id": ["tmdb_id", "tmdbid", "tmdb"],
+}
+LIBRARY_COLUMNS = ["key", "title", "path", "type", "genre", "actors", "plot", "year", "original_title", "imdb_id", "tmdb_id"]
+# Erhöhen, wenn sich LIBRARY_COLUMNS ändert -> alte Snapshots werden trotz gleichem ETag neu eingelesen
+SNAPSHOT_VERSION = 2
+ALL_ALIASES = {a for aliases in COLUMN_ALIASES.values() for a in aliases}
+
+def detect_columns(columns):
+    """Ordnet einmal pro Blatt die Excel-Spalten den Feldern zu -> {feld: spaltenname}."""
+    mapping = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        col = next((c for c in columns if str(c).lower() in aliases), None)
+        if col is not None: mapping[field] = col
+    return mapping
+
+def parse_sheet(df, sheet, category):
+    """Wandelt ein Excel-Blatt spaltenweise in das Bibliotheksformat um (kein iterrows)."""
+    cols = detect_columns(df.columns)
+    if "title" not in cols: return None
+    out = df[list(cols.values())].set_axis(list(cols.keys()), axis=1)
+    out["title"] = out["title"].str.strip()
+    out = out[out["title"].str.len() > 1].copy()
+    for field in ("genre", "actors", "plot", "year", "original_title", "imdb_id", "tmdb_id"):
+        out[field] = out[field].fillna("").str.strip() if field in out else ""
+    # "2011–2017" -> "2011", "39340.0" -> "39340"
+    out["year"] = out["year"].str.extract(r"((?:19|20)\d{2})", expand=False).fillna("")
+    out["tmdb_id"] = out["tmdb_id"].str.replace(r"\.0$", "", regex=True)
+    out["key"] = out["title"].str.lower()
+    out["path"] = sheet
+    out["type"] = category
+    return out[LIBRARY_COLUMNS]
+
+def parse_workbook(content, category):
+    """Liest alle Blätter einer Arbeitsmappe (nur die benötigten Spalten) in ein DataFrame."""
+    with io.BytesIO(content) as f:
+        sheets = pd.read_excel(f, sheet_name=None, dtype=str, engine='openpyxl',
+                               usecols=lambda c: str(c).lower() in ALL_ALIASES)
+    frames = [parse_sheet(df, name, category) for name, df in sheets.items()]
+    frames = [f for f in frames if f is not None and not f.empty]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=LIBRARY_COLUMNS)
+
+def category_for_url(url):
+    return "Serie" if "Serie" in url else "Film"
+
+# --- SNAPSHOT CACHE ---
+class SnapshotStore:
+    """Parquet-Snapshots der eingelesenen Arbeitsmappen, je Datei mit dem ETag von GitHub verknüpft.
+
+    Solange GitHub auf If-None-Match mit 304 antwortet, wird statt openpyxl nur der
+    Snapshot (memory-mapped) gelesen. Geänderte Dateien werden einzeln neu eingelesen.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        self._lock = threading.Lock()
+        self.manifest = self._read_manifest()
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f: return json.load(f)
+        except (OSError, ValueError): return {}
+
+    def path_for(self, url):
+        return os.path.join(self.directory, hashlib.sha1(url.encode("utf-8")).hexdigest()[:16] + ".parquet")
+
+    def etag(self, url):
+        entry = self.manifest.get(url)
+        if entry and entry.get("version") == SNAPSHOT_VERSION and os.path.exists(self.path_for(url)): return entry.get("etag")
+        return None
+
+    def load(self, url):
+        path = self.path_for(url)
+        if not os.path.exists(path): return None
+        try: df = pd.read_parquet(path, memory_map=True)
+        except Exception: return None
+        # Älterer Snapshot (nur als Notnagel offline): fehlende Spalten leer ergänzen
+        missing = [c for c in LIBRARY_COLUMNS if c not in df.columns]
+        return df.assign(**{c: "" for c in missing})[LIBRARY_COLUMNS] if missing else df
+
+    def save(self, url, etag, df):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path_for(url)
+        df.to_parquet(path + ".tmp", index=False)
+        os.replace(path + ".tmp", path)
+        with self._lock:
+            self.manifest[url] = {"etag": etag, "rows": len(df), "saved": time.time(), "version": SNAPSHOT_VERSION}
+            with open(self.manifest_path + ".tmp", "w", encoding="utf-8") as f: json.dump(self.manifest, f, indent=1)
+            os.replace(self.manifest_path + ".tmp", self.manifest_path)
+
+def load_workbook(url, headers=None, store=None, timeout=10, get=requests.get):
+    """Holt eine Arbeitsmappe als Bibliotheks-DataFrame, wenn möglich aus dem Snapshot.
+
+    Liefert (df, quelle) mit quelle in "snapshot", "download" oder "veraltet".
+    """
+    name, t0 = url.rsplit("/", 1)[-1], time.perf_counter()
+    headers = dict(headers or {})
+    etag = store.etag(url) if store else None
+    if etag: headers["If-None-Match"] = etag
+    try:
+        response = get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304:
+            df = store.load(url)
+            if df is not None:
+                METRICS.record("github", name, time.perf_counter() - t0, cache="snapshot", start=t0)
+                return df, "snapshot"
+            # Snapshot unlesbar -> ohne ETag vollständig neu holen
+            headers.pop("If-None-Match", None)
+            response = get(url, headers=headers, timeout=timeout)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        # Offline oder GitHub-Fehler: lieber den alten Stand zeigen als gar nichts
+        df = store.load(url) if store else None
+        METRICS.record("github", name, time.perf_counter() - t0, cache="veraltet" if df is not None else None,
+                       error=type(e).__name__, start=t0)
+        if df is not None: return df, "veraltet"
+        raise
+    df = parse_workbook(response.content, category_for_url(url))
+    if store: store.save(url, response.headers.get("ETag"), df)
+    METRICS.record("github", name, time.perf_counter() - t0, len(response.content), "download", start=t0)
+    return df, "download"
+
+def _load_reported(url, headers, store, timeout, get):
+    """load_workbook mit Berichtszeile; Fehler landen im Bericht statt als Ausnahme."""
+    t0 = time.perf_counter()
+    try:
+        df, source = load_workbook(url, headers, store, timeout=timeout, get=get)
+        return {"url": url, "source": source, "seconds": time.perf_counter() - t0, "rows": len(df), "error": None}, df
+    except Exception as e:
+        return {"url": url, "source": "fehler", "seconds": time.perf_counter() - t0, "rows": 0, "error": f"{type(e).__name__}: {e}"}, None
+
+def load_library(urls, headers=None, store=None, session=None, timeout=10):
+    """Lädt alle Arbeitsmappen parallel (Download + Einlesen je Datei in einem eigenen Thread).
+
+    Liefert eine LocalLibrary; der Bericht pro Datei (Quelle, Dauer, Zeilen, Fehler)
+    hängt als .load_report daran.
+    """
+    get = session.get if session else requests.get
+    with ThreadPoolExecutor(max_workers=max(1, len(urls))) as pool:
+        results = list(pool.map(lambda url: _load_reported(url, headers, store, timeout, get), urls))
+    # Reihenfolge der URLs beibehalten, damit spätere Dateien wie bisher gewinnen
+    library = LocalLibrary([df for _, df in results])
+    library.load_report = [report for report, _ in results]
+    return library
+
+# --- DELTA-SNAPSHOTS ---
+# gui_upload.py legt statt der Excel-Dateien normalisierte CSV-Partitionen (ein Blatt = eine Datei)
+# plus Manifest mit Inhalts-Hashes ins Repo. Die App lädt danach nur Partitionen mit neuem Hash.
+PARTITION_DIR = "snapshots"
+MANIFEST_PATH = f"{PARTITION_DIR}/manifest.json"
+MANIFEST_VERSION = 1
+
+def sha256_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+def partition_path(workbook, sheet):
+    """'Serien_Rosi_2025.xlsx', 'Krimi & Thriller' -> 'snapshots/serien_rosi_2025/krimi_thriller-3f9a1c.csv'."""
+    stem = RE_NON_ALNUM.sub("_", os.path.splitext(workbook)[0].lower()).strip("_")
+    slug = RE_NON_ALNUM.sub("_", sheet.lower().translate(UMLAUT_MAP)).strip("_") or "blatt"
+    return f"{PARTITION_DIR}/{stem}/{slug}-{hashlib.sha1(sheet.encode('utf-8')).hexdigest()[:6]}.csv"
+
+def partition_bytes(df):
+    # Feste Spalten, "\n" und UTF-8 -> gleicher Inhalt ergibt auf jedem Rechner denselben Hash
+    return df[LIBRARY_COLUMNS].to_csv(index=False, lineterminator="\n").encode("utf-8")
+
+def read_partition(content):
+    df = pd.read_csv(io.BytesIO(content), dtype=str, keep_default_na=False)
+    missing = [c for c in LIBRARY_COLUMNS if c not in df.columns]
+    return df.assign(**{c: "" for c in missing})[LIBRARY_COLUMNS] if missing else df[LIBRARY_COLUMNS]
+
+def new_manifest():
+    return {"version": MANIFEST_VERSION, "files": {}}
+
+def read_manifest(path):
+    try:
+        with open(path, encoding="utf-8") as f: manifest = json.load(f)
+    except (OSError, ValueError):
+        return new_manifest()
+    return manifest if manifest.get("version") == MANIFEST_VERSION else new_manifest()
+
+def write_manifest(path, manifest):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f: json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(path + ".tmp", path)
+
+def export_partitions(content, workbook, repo_dir, manifest, df=None):
+    """Zerlegt eine Arbeitsmappe in Partitionen und schreibt nur die mit geändertem Inhalt.
+
+    df: bereits eingelesene Mappe (parse_workbook), sonst wird hier eingelesen.
+    Aktualisiert manifest["files"][workbook] und liefert (geschrieben, gelöscht) als Repo-Pfade.
+    """
+    if df is None: df = parse_workbook(content, category_for_url(workbook))
+    old = manifest["files"].get(workbook, {}).get("partitions", {})
+    parts, written = {}, []
+    # sort=False: Blattreihenfolge bleibt, damit wie bisher spätere Blätter gleiche Titel überschreiben
+    for sheet, part in df.groupby("path", sort=False):
+        data = partition_bytes(part)
+        rel = partition_path(workbook, sheet)
+        parts[sheet] = {"path": rel, "sha256": sha256_bytes(data), "rows": len(part)}
+        target = os.path.join(repo_dir, rel)
+        if old.get(sheet, {}).get("sha256") == parts[sheet]["sha256"] and os.path.exists(target): continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target + ".tmp", "wb") as f: f.write(data)
+        os.replace(target + ".tmp", target)
+        written.append(rel)
+    removed = [e["path"] for sheet, e in old.items() if sheet not in parts or parts[sheet]["path"] != e["path"]]
+    for rel in removed:
+        try: os.remove(os.path.join(repo_dir, rel))
+        except FileNotFoundError: pass
+    manifest["files"][workbook] = {"sha256": sha256_bytes(content), "category": category_for_url(workbook),
+                                   "rows": len(df), "updated": time.strftime("%Y-%m-%d %H:%M:%S"), "partitions": parts}
+    return written, removed
+
+def load_partitioned(manifest_url, urls=(), headers=None, store=None, session=None, timeout=10):
+    """Bibliothek aus den Delta-Snapshots: Manifest holen, nur Partitionen mit neuem Hash herunterladen.
+
+    Der Hash aus dem Manifest dient im SnapshotStore als ETag; unveränderte Partitionen kommen
+    ohne Anfrage aus dem lokalen Parquet. Ist das Manifest nicht erreichbar, wird mit dem zuletzt
+    gesehenen weitergearbeitet (Quelle "veraltet"); gibt es keins, fliegt die Ausnahme zur Excel-Variante.
+    Arbeitsmappen aus urls, die das Manifest nicht enthält, kommen wie bei load_library direkt dazu;
+    die Reihenfolge folgt urls (spätere gewinnen), danach Mappen, die nur im Manifest stehen.
+    """
+    get = session.get if session else requests.get
+    base = manifest_url[:-len(MANIFEST_PATH)]
+    saved = os.path.join(store.directory, "delta_manifest.json") if store else None
+    stale = False
+    t0 = time.perf_counter()
+    try:
+        response = get(manifest_url, headers=headers or {}, timeout=timeout)
+        response.raise_for_status()
+        manifest = response.json()
+        if manifest.get("version") != MANIFEST_VERSION: raise ValueError(f"Manifest-Version {manifest.get('version')}")
+        if saved: write_manifest(saved, manifest)
+        METRICS.record("github", "manifest", time.perf_counter() - t0, len(response.content), "miss", start=t0)
+    except (requests.RequestException, ValueError) as e:
+        METRICS.record("github", "manifest", time.perf_counter() - t0, error=type(e).__name__, start=t0)
+        manifest = read_manifest(saved) if saved else new_manifest()
+        if not manifest["files"]: raise
+        stale = True
+
+    def _part(entry):
+        url, sha = base + entry["path"], entry["sha256"]
+        if store and store.etag(url) == sha:
+            df = store.load(url)
+            if df is not None: return df, False
+        if stale: raise RuntimeError(f"{entry['path']} fehlt offline")
+        p0 = time.perf_counter()
+        response = get(url, headers=headers or {}, timeout=timeout)
+        response.raise_for_status()
+        if sha256_bytes(response.content) != sha: raise ValueError(f"{entry['path']}: Hash passt nicht zum Manifest")
+        df = read_partition(response.content)
+        if store: store.save(url, sha, df)
+        METRICS.record("github", entry["path"].rsplit("/", 1)[-1], time.perf_counter() - p0, len(response.content), "download", start=p0)
+        return df, True
+
+    def _one(item):
+        workbook, entry = item
+        try:
+            df, fetched = _part(entry)
+            return workbook, df, fetched, None
+        except Exception as e:
+            return workbook, None, False, f"{type(e).__name__}: {e}"
+
+    names = {url.rsplit("/", 1)[-1]: url for url in urls}
+    extra = [url for name, url in names.items() if name not in manifest["files"]]
+    entries = [(workbook, e) for workbook, info in manifest["files"].items() for e in info["partitions"].values()]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        direct = pool.map(lambda url: _load_reported(url, headers, store, timeout, get), extra)
+        results = list(pool.map(_one, entries))
+        direct = dict(zip([url.rsplit("/", 1)[-1] for url in extra], direct))
+    frames, report = {}, {}
+    for workbook, df, fetched, error in results:
+        r = report.setdefault(workbook, {"url": base + workbook, "parts": 0, "fetched": 0, "rows": 0, "error": None})
+        r["parts"] += 1
+        if error: r["error"] = r["error"] or error
+        else:
+            frames.setdefault(workbook, []).append(df)
+            r["fetched"] += fetched
+            r["rows"] += len(df)
+    seconds = time.perf_counter() - t0
+    for r in report.values():
+        r["source"] = "veraltet" if stale else f"delta {r['fetched']}/{r['parts']}" if r["fetched"] else "snapshot"
+        r["seconds"] = seconds
+    for workbook, (r, df) in direct.items():
+        report[workbook] = r
+        frames[workbook] = [df]
+    order = list(names) + [w for w in manifest["files"] if w not in names]
+    library = LocalLibrary([df for w in order for df in frames.get(w, [])])
+    library.load_report = [{k: report[w][k] for k in ("url", "source", "seconds", "rows", "error")} for w in order if w in report]
+    return library
+
+# --- LOKALE BIBLIOTHEK ---
+class LocalLibrary(Mapping):
+    """Spaltenorientierte Bibliothek. Verhält sich wie das alte {titel_klein: eintrag}-Dict,
+    baut die Einträge aber erst beim Zugriff."""
+
+    def __init__(self, frames=()):
+        frames = [f for f in frames if f is not None and not f.empty]
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=LIBRARY_COLUMNS)
+        # Wie beim Dict: spätere Zeilen mit gleichem Titel überschreiben frühere
+        self.df = df.drop_duplicates("key", keep="last").reset_index(drop=True)
+        self.load_report = []
+        self._pos = None
+
+    def _positions(self):
+        if self._pos is None: self._pos = dict(zip(self.df["key"], range(len(self.df))))
+        return self._pos
+
+    def __getitem__(self, key):
+        row = self.df.iloc[self._positions()[key]]
+        return {c: row[c] for c in LIBRARY_COLUMNS if c != "key"}
+
+    def __contains__(self, key):
+        return key in self._positions()
+
+    def __iter__(self):
+        return iter(self.df["key"])
+
+    def __len__(self):
+        return len(self.df)
+
+    def __getstate__(self):
+        # Für st.cache_data nur die Daten pickeln, der Positions-Index wird neu gebaut
+        return {**self.__dict__, "_pos": None}
+
+# --- TITEL NORMALISIERUNG ---
+UMLAUT_MAP = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+ARTICLES = r"(?:der|die|das|the|a|an|ein|eine|le|la|les|el|il)"
+RE_LEADING_ARTICLE = re.compile(rf"^{ARTICLES}\s+")
+RE_TRAILING_ARTICLE = re.compile(rf",\s*{ARTICLES}$")
+RE_YEAR_SUFFIX = re.compile(r"\s*[\(\[]\s*(?:19|20)\d{2}\s*[\)\]]\s*$")
+RE_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+def normalize_title(title):
+    """Faltet Umlaute, Akzente, Artikel und Jahres-Suffixe, damit 'Der Pate (1972)' == 'Pate, Der'."""
+    if not title: return ""
+    t = str(title).lower().strip().translate(UMLAUT_MAP)
+    t = "".join(c for c in unicodedata.normalize("NFKD", t) if not unicodedata.combining(c))
+    t = RE_YEAR_SUFFIX.sub("", t)
+    t = RE_TRAILING_ARTICLE.sub("", t)
+    t = RE_LEADING_ARTICLE.sub("", t) or t
+    t = RE_NON_ALNUM.sub(" ", t).strip()
+    return t
+
+def title_ngrams(norm, n=3):
+    # Mit Leerzeichen gepolstert -> Wortanfänge (" st") sind eigene Grams, kurze Titel bekommen auch welche
+    padded = f" {norm} "
+    return {padded[i:i + n] for i in range(max(1, len(padded) - n + 1))}
+
+# --- FUZZY MATCHER ---
+class LibraryMatcher:
+    """Einmal gebauter Index über die lokale Bibliothek für schnelle TMDB-Titel-Abgleiche.
+
+    Statt bei jedem Treffer alle Titel mit WRatio zu vergleichen, wird über einen
+    Trigramm-Index eine kleine Kandidatenliste gebildet und nur diese bewertet.
+    """
+
+    def __init__(self, library, score_cutoff=85, max_candidates=64, ngram=3):
+        self.library = library or {}
+        self.score_cutoff = score_cutoff
+        self.max_candidates = max_candidates
+        self.ngram = ngram
+
+        # Normalisierte Schlüssel (erste Zeile gewinnt bei Kollisionen)
+        self.exact = {}
+        for key in self.library:
+            norm = normalize_title(key)
+            if norm and norm not in self.exact: self.exact[norm] = key
+        self.norm_keys = list(self.exact.keys())
+        self.orig_keys = [self.exact[k] for k in self.norm_keys]
+
+        # Invertierter Trigramm-Index: gram -> np.array der Schlüssel-Positionen, gewichtet nach Seltenheit
+        postings = {}
+        for idx, norm in enumerate(self.norm_keys):
+            for g in title_ngrams(norm, ngram):
+                postings.setdefault(g, []).append(idx)
+        n_keys = max(len(self.norm_keys), 1)
+        self.postings = {g: np.asarray(ids, dtype=np.int32) for g, ids in postings.items()}
+        self.idf = {g: float(np.log1p(n_keys / len(ids))) for g, ids in postings.items()}
+
+    def __len__(self):
+        return len(self.norm_keys)
+
+    def candidates(self, norm):
+        """Liefert die Positionen der vielversprechendsten Schlüssel für einen normalisierten Titel."""
+        grams = [g for g in title_ngrams(norm, self.ngram) if g in self.postings]
+        if not grams: return np.empty(0, dtype=np.int32)
+        ids = np.concatenate([self.postings[g] for g in grams])
+        weights = np.concatenate([np.full(len(self.postings[g]), self.idf[g]) for g in grams])
+        scores = np.bincount(ids, weights=weights, minlength=len(self.norm_keys))
+        hit = np.flatnonzero(scores)
+        if len(hit) > self.max_candidates:
+            hit = hit[np.argpartition(scores[hit], -self.max_candidates)[-self.max_candidates:]]
+        return hit
+
+    def match(self, title):
+        return self.match_many([title])[0]
+
+    def match_many(self, titles):
+        """Gleicht eine ganze Ergebnisliste ab; jeder Titel nur gegen seine eigene Kandidatenliste. Reihenfolge bleibt erhalten."""
+        results = [None] * len(titles)
+        if not self.norm_keys: return results
+        for pos, title in enumerate(titles):
+            norm = normalize_title(title)
+            if not norm: continue
+            # Wörtlicher Titel zuerst (wie früher find_local_fuzzy): bei normalisierten Kollisionen
+            # ("The Hospital" / "Hospital", "Die Hard" / "Hard") gewinnt sonst die falsche Zeile
+            literal = str(title).strip().lower()
+            if literal in self.library:
+                results[pos] = self.library[literal]
+                continue
+            if norm in self.exact:
+                results[pos] = self.library[self.exact[norm]]
+                continue
+            # Sortiert -> bei Gleichstand gewinnt wie im Gesamtindex der frühere Schlüssel
+            cand = np.sort(self.candidates(norm))
+            if not len(cand): continue
+            best = process.extractOne(norm, [self.norm_keys[i] for i in cand], scorer=fuzz.WRatio, score_cutoff=self.score_cutoff)
+            if best: results[pos] = self.library[self.orig_keys[cand[best[2]]]]
+        return results
+
+# --- VOLLTEXT-INDEX ---
+SEARCH_FIELDS = {"title": 5.0, "actors": 3.0, "genre": 2.0, "plot": 1.0, "path": 0.0, "type": 0.0}
+FIELD_ALIASES = {
+    "title": "title", "titel": "title", "actor": "actors", "actors": "actors", "schauspieler": "actors",
+    "darsteller": "actors", "cast": "actors", "genre": "genre", "plot": "plot", "handlung": "plot",
+    "type": "type", "typ": "type", "path": "path", "ablage": "path", "ort": "path",
+}
+RE_QUERY_PART = re.compile(r'(\w+):"([^"]*)"|(\w+):(\S+)|"([^"]*)"|(\S+)')
+RE_WORD = re.compile(r"[^\W_]+")
+RE_NOT_ASCII_ALNUM = re.compile(r"[^0-9a-z]+")
+PREFIX_WEIGHT = 0.6  # Präfix-Treffer ("ster" -> "sterne") zählen weniger als ganze Wörter
+
+def fold_token(token):
+    """Ein (klein geschriebenes) Wort ohne Umlaute und Akzente: 'müller' -> 'mueller', 'élite' -> 'elite'."""
+    t = unicodedata.normalize("NFKD", token.translate(UMLAUT_MAP))
+    return RE_NOT_ASCII_ALNUM.sub("", "".join(c for c in t if not unicodedata.combining(c)))
+
+def fold_tokens(text):
+    return [f for f in (fold_token(w) for w in RE_WORD.findall(str(text).lower())) if f]
+
+def parse_query(query):
+    """'jude law genre:krimi type:Serie' -> [(None, 'jude'), (None, 'law'), ('genre', 'krimi'), ('type', 'serie')]."""
+    terms = []
+    for f_q, v_q, f, v, phrase, word in RE_QUERY_PART.findall(query or ""):
+        field = FIELD_ALIASES.get((f_q or f).lower()) if (f_q or f) else None
+        value = v_q or v or phrase or word
+        if (f_q or f) and field is None: value = f"{f_q or f} {value}"  # unbekanntes Feld -> normaler Text
+        terms.extend((field, tok) for tok in fold_tokens(value))
+    return terms
+
+class FieldIndex:
+    """Sortiertes Vokabular + flache Postings eines Feldes. Alle Zeilen zu einem Präfix liegen am Stück.
+
+    Die ganze Spalte wird als ein String zerlegt; gefaltet werden nur die verschiedenen
+    Wörter (einige Tausend), nicht jede Zelle.
+    """
+
+    def __init__(self, series):
+        n = max(len(series), 1)
+        text = " \x01 ".join(series.fillna("").astype(str).tolist()).lower()
+        toks = np.array(text.split(), dtype=object)
+        is_row_sep = toks == "\x01"
+        rows = np.cumsum(is_row_sep)[~is_row_sep]
+        codes, uniques = pd.factorize(toks[~is_row_sep])
+
+        # Jedes verschiedene Rohwort ("science-fiction,") zerfällt in 0..n gefaltete Wörter
+        parts = [fold_tokens(u) for u in uniques]
+        self.vocab = np.array(sorted({w for p in parts for w in p}), dtype=str)
+        vocab_id = {w: i for i, w in enumerate(self.vocab)}
+        n_parts = np.array([len(p) for p in parts] or [0], dtype=np.int64)
+        flat = np.array([vocab_id[w] for p in parts for w in p], dtype=np.int64)
+        offsets = np.cumsum(n_parts) - n_parts
+        counts = n_parts[codes] if len(codes) else np.empty(0, dtype=np.int64)
+        within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        token_ids = flat[np.repeat(offsets[codes], counts) + within] if len(flat) else np.empty(0, dtype=np.int64)
+        rows = np.repeat(rows, counts)
+
+        # Paare (wort, zeile) entdoppeln und sortieren in einem Schritt über einen kombinierten Schlüssel
+        keys = np.sort(token_ids * n + rows)
+        keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))] if len(keys) else keys
+        token_ids, self.rows = keys // n, (keys % n).astype(np.int32)
+        self.starts = np.searchsorted(token_ids, np.arange(len(self.vocab)), "left")
+        self.ends = np.searchsorted(token_ids, np.arange(len(self.vocab)), "right")
+        self.idf = np.log1p(n / np.maximum(self.ends - self.starts, 1))
+
+    def scores(self, term, n_rows):
+        """Trefferwerte aller Zeilen für einen Begriff (exakt oder als Wortanfang)."""
+        lo = np.searchsorted(self.vocab, term, "left")
+        hi = np.searchsorted(self.vocab, term + "\x7f", "left")
+        if hi <= lo or not term: return None
+        counts = self.ends[lo:hi] - self.starts[lo:hi]
+        weights = self.idf[lo:hi] * np.where(self.vocab[lo:hi] == term, 1.0, PREFIX_WEIGHT)
+        rows = self.rows[self.starts[lo]:self.ends[hi - 1]]
+        if not len(rows): return None
+        return np.bincount(rows, weights=np.repeat(weights, counts), minlength=n_rows)
+
+class LibrarySearchIndex:
+    """Invertierter Index über Titel, Schauspieler, Genre und Handlung der lokalen Bibliothek.
+
+    Jeder Begriff muss in irgendeinem Feld vorkommen (UND), gewichtet nach Feld und Seltenheit.
+    Feldfilter: actor:, genre:, title:, plot:, type:Serie, ablage: (auch in Anführungszeichen).
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self.n = len(df)
+        self.fields = {f: FieldIndex(df[f]) for f in SEARCH_FIELDS if f in df.columns}
+
+    def search(self, query, limit=None):
+        """Liefert die Trefferpositionen (beste zuerst); bei leerer Anfrage alle Zeilen in Originalreihenfolge."""
+        terms = parse_query(query)
+        if not terms: return np.arange(self.n)
+        total = np.zeros(self.n)
+        matched = np.ones(self.n, dtype=bool)
+        for field, term in terms:
+            fields = [field] if field else [f for f, w in SEARCH_FIELDS.items() if w > 0]
+            best = np.zeros(self.n)
+            for f in fields:
+                if f not in self.fields: continue
+                s = self.fields[f].scores(term, self.n)
+                if s is not None: np.maximum(best, s * (SEARCH_FIELDS[f] or 1.0), out=best)
+            matched &= best > 0
+            total += best
+        hits = np.flatnonzero(matched)
+        hits = hits[np.argsort(-total[hits], kind="stable")]
+        return hits[:limit] if limit else hits
+
+    def search_frame(self, query, limit=None):
+        return self.df.iloc[self.search(query, limit)]
@@ -0,0 +1,157 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+from rapidfuzz import fuzz
+from couchpilot_library import normalize_title
+
+# --- ZUORDNUNG EINER ZEILE ---
+MATCH_CUTOFF = 90       # Titelähnlichkeit (WRatio auf normalisierten Titeln) ohne passendes Jahr
+MATCH_CUTOFF_YEAR = 80  # ... wenn das Jahr übereinstimmt
+RETRY_AFTER = 7 * 24 * 3600
+
+def media_for_type(lib_type):
+    return "tv" if lib_type == "Serie" else "movie"
+
+def row_signature(row):
+    """Ändert sich Titel, Jahr, Typ oder eine ID in der Excel-Liste, wird die Zeile neu zugeordnet."""
+    raw = "|".join(str(row.get(c, "")) for c in ("title", "year", "type", "original_title", "imdb_id", "tmdb_id"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+def candidate_score(row, cand):
+    """Wie gut passt ein TMDB-Suchtreffer zur Bibliothekszeile? Liefert 0..100."""
+    names = {normalize_title(cand.get(k)) for k in ("title", "name", "original_title", "original_name")} - {""}
+    mine = {normalize_title(row.get(k)) for k in ("title", "original_title")} - {""}
+    if not names or not mine: return 0.0
+    score = max(fuzz.WRatio(a, b) for a in mine for b in names)
+    year = (cand.get("release_date") or cand.get("first_air_date") or "")[:4]
+    if row.get("year") and year:
+        if year == row["year"]: return score if score >= MATCH_CUTOFF_YEAR else 0.0
+        if abs(int(year) - int(row["year"])) > 1: score -= 15
+    return score if score >= MATCH_CUTOFF else 0.0
+
+def resolve_row(row, fetch_json, base_url, api_key):
+    """Eine Bibliothekszeile -> (tmdb_id, media, methode, score) oder (None, media, None, 0).
+
+    Reihenfolge: TMDb_ID aus der Liste, dann imdbID über /find, zuletzt Suche nach Titel + Jahr + Typ.
+    """
+    media = media_for_type(row.get("type"))
+    if row.get("tmdb_id", "").isdigit(): return row["tmdb_id"], media, "liste", 100.0
+    if row.get("imdb_id", "").startswith("tt"):
+        found = fetch_json(f"{base_url}/find/{row['imdb_id']}?api_key={api_key}&external_source=imdb_id")
+        hits = found.get(f"{media}_results") or found.get("movie_results") or found.get("tv_results") or []
+        if hits:
+            hit_media = media if found.get(f"{media}_results") else ("movie" if found.get("movie_results") else "tv")
+            return str(hits[0]["id"]), hit_media, "imdb", 100.0
+    year_param = "primary_release_year" if media == "movie" else "first_air_date_year"
+    best = (0.0, None)
+    for query in dict.fromkeys(q for q in (row.get("title"), row.get("original_title")) if q):
+        url = f"{base_url}/search/{media}?api_key={api_key}&query={quote(query)}&language=de-DE"
+        for with_year in ((True, False) if row.get("year") else (False,)):
+            results = fetch_json(url + (f"&{year_param}={row['year']}" if with_year else "")).get("results", [])
+            for cand in results[:10]:
+                score = candidate_score(row, cand)
+                if score > best[0]: best = (score, cand)
+            if best[1] is not None: break
+        if best[0] >= 100: break
+    if best[1] is None: return None, media, None, 0.0
+    return str(best[1]["id"]), media, "suche", best[0]
+
+# --- VERKNÜPFUNGSTABELLE ---
+class LibraryLinks:
+    """Persistente Zuordnung Bibliothekszeile <-> TMDB-ID.
+
+    Die Zuordnung läuft im Hintergrund (parallel, in Blöcken, über den TMDB-Cache) und wird
+    in SQLite gespeichert; nur neue oder geänderte Zeilen werden erneut aufgelöst. Danach ist
+    "ist das in der Sammlung?" ein Dict-Zugriff über (movie|tv, tmdb_id).
+    """
+
+    def __init__(self, path, library_df, fetch_json, base_url, api_key, max_workers=8, batch_size=64, on_progress=None):
+        self.fetch_json = fetch_json
+        self.base_url = base_url
+        self.api_key = api_key
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.on_progress = on_progress
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS links (key TEXT PRIMARY KEY, sig TEXT, tmdb_id TEXT, media TEXT, "
+                         "method TEXT, score REAL, resolved_at REAL)")
+        self._db.commit()
+
+        cols = [c for c in ("key", "title", "year", "type", "original_title", "imdb_id", "tmdb_id") if c in library_df.columns]
+        self.rows = {r["key"]: {**r, "sig": row_signature(r)} for r in library_df[cols].to_dict("records")}
+        self.by_id = {}
+        self.by_key = {}
+        saved = self._db.execute("SELECT key, sig, tmdb_id, media, resolved_at FROM links").fetchall()
+        for key, sig, tmdb_id, media, resolved_at in saved:
+            row = self.rows.get(key)
+            if row is None or row["sig"] != sig: continue
+            row["resolved_at"] = resolved_at
+            if tmdb_id: self._link(key, media, tmdb_id)
+
+    def _link(self, key, media, tmdb_id):
+        self.by_id[(media, tmdb_id)] = key
+        self.by_key[key] = (media, tmdb_id)
+
+    def lookup(self, media, tmdb_id):
+        """Schlüssel der Bibliothekszeile zu einem TMDB-Eintrag oder None."""
+        return self.by_id.get((media, str(tmdb_id).replace('.0', '')))
+
+    def is_linked(self, key):
+        return key in self.by_key
+
+    def pending(self, now=None):
+        now = now or time.time()
+        with self._lock:
+            return [r for r in self.rows.values()
+                    if r.get("resolved_at") is None or (r["key"] not in self.by_key and now - r["resolved_at"] > RETRY_AFTER)]
+
+    def progress(self):
+        with self._lock:
+            done = sum(1 for r in self.rows.values() if r.get("resolved_at") is not None)
+            return {"rows": len(self.rows), "done": done, "linked": len(self.by_key)}
+
+    def _resolve(self, row):
+        try:
+            return row, resolve_row(row, self.fetch_json, self.base_url, self.api_key)
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            return row, None
+
+    def resolve_pending(self):
+        """Alle offenen Zeilen in Blöcken auflösen; jeder Block wird sofort gespeichert."""
+        todo = self.pending()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for start in range(0, len(todo), self.batch_size):
+                if self._stop.is_set(): break
+                now = time.time()
+                records = []
+                for row, result in pool.map(self._resolve, todo[start:start + self.batch_size]):
+                    if result is None: continue
+                    tmdb_id, media, method, score = result
+                    records.append((row["key"], row["sig"], tmdb_id, media, method, score, now))
+                with self._lock:
+                    for key, _, tmdb_id, media, _, _, resolved_at in records:
+                        self.rows[key]["resolved_at"] = resolved_at
+                        if tmdb_id: self._link(key, media, tmdb_id)
+                    self._db.executemany("INSERT OR REPLACE INTO links VALUES (?, ?, ?, ?, ?, ?, ?)", records)
+                    self._db.commit()
+                if self.on_progress: self.on_progress()
+        return len(todo)
+
+    def start(self):
+        if self._thread is None and self.pending():
+            self._thread = threading.Thread(target=self.resolve_pending, name="library-links", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Hintergrund-Auflösung nach dem laufenden Block beenden (z.B. wenn die Instanz ersetzt wird)."""
+        self._stop.set()
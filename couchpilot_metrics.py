@@ -0,0 +1,141 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+# --- EIN DURCHLAUF ---
+class RunTrace:
+    """Alle Messpunkte eines Streamlit-Durchlaufs, relativ zu dessen Start (für das Wasserfall-Diagramm)."""
+
+    def __init__(self, label=""):
+        self.label = label
+        self.started = time.perf_counter()
+        self.wall = time.time()
+        self.events = []
+        self.total = None
+        self.aborted = False
+        self._section = None
+
+    def add(self, event, start):
+        self.events.append({**event, "offset": start - self.started})
+
+# --- MESSWERTE ---
+class Metrics:
+    """Prozessweite Messwerte für externe Aufrufe und Render-Abschnitte.
+
+    Pro Name (z.B. "tmdb:search") ein gleitendes Fenster der letzten Laufzeiten für p50/p95
+    sowie Summen für Aufrufe, Fehler, Bytes und Cache-Treffer. Läuft der Aufruf im Skript-Thread
+    einer Session, landet er zusätzlich in deren RunTrace. Optional wird jedes Ereignis als
+    JSONL-Zeile angehängt.
+    """
+
+    def __init__(self, window=500, jsonl_path=None):
+        self.window = window
+        self.jsonl_path = jsonl_path
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._totals = defaultdict(lambda: {"calls": 0, "errors": 0, "bytes": 0, "hits": 0, "misses": 0})
+        self._lines = []
+
+    def record(self, kind, name, seconds, nbytes=0, cache=None, error=None, start=None):
+        """Ein Messpunkt. cache: "hit"/"miss" oder eine sprechende Quelle ("snapshot", "304", ...)."""
+        key = f"{kind}:{name}"
+        event = {"t": time.time(), "kind": kind, "name": name, "seconds": round(seconds, 6), "bytes": nbytes,
+                 "cache": cache, "error": error}
+        with self._lock:
+            self._samples[key].append(seconds)
+            totals = self._totals[key]
+            totals["calls"] += 1
+            totals["bytes"] += nbytes or 0
+            if error: totals["errors"] += 1
+            if cache in ("hit", "snapshot", "304", "joined"): totals["hits"] += 1
+            elif cache is not None: totals["misses"] += 1
+            if self.jsonl_path: self._lines.append(json.dumps(event, ensure_ascii=False))
+        trace = getattr(self._local, "trace", None)
+        if trace is not None: trace.add(event, start if start is not None else time.perf_counter() - seconds)
+
+    @contextmanager
+    def span(self, kind, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.record(kind, name, time.perf_counter() - t0, error=type(e).__name__, start=t0)
+            raise
+        self.record(kind, name, time.perf_counter() - t0, start=t0)
+
+    # Durchläufe
+    def begin_run(self, label=""):
+        trace = RunTrace(label)
+        self._local.trace = trace
+        return trace
+
+    def section(self, name):
+        """Schließt den laufenden Render-Abschnitt dieses Threads und beginnt den nächsten."""
+        trace = getattr(self._local, "trace", None)
+        if trace is None: return
+        now = time.perf_counter()
+        if trace._section: self.record("render", trace._section[0], now - trace._section[1], start=trace._section[1])
+        trace._section = (name, now) if name else None
+
+    def finish_run(self, trace, aborted=False):
+        """Beendet einen Durchlauf; auch nachträglich für Läufe, die mit st.rerun()/st.stop() abgebrochen sind."""
+        if trace.total is not None: return trace
+        if getattr(self._local, "trace", None) is trace:
+            self.section(None)
+            self._local.trace = None
+        trace.total = time.perf_counter() - trace.started
+        trace.aborted = aborted
+        self.record("rerun", trace.label or "?", trace.total, error="abgebrochen" if aborted else None)
+        self.flush()
+        return trace
+
+    # Auswertung
+    def summary(self):
+        import numpy as np  # erst beim Auswerten; jedes Modul importiert METRICS, aber kaum ein Lauf zeigt die Tabelle
+        with self._lock:
+            items = [(key, np.fromiter(samples, dtype=float), dict(self._totals[key])) for key, samples in self._samples.items()]
+        rows = []
+        for key, samples, totals in sorted(items):
+            cached = totals["hits"] + totals["misses"]
+            rows.append({"name": key, "calls": totals["calls"], "errors": totals["errors"],
+                         "p50_ms": float(np.percentile(samples, 50)) * 1000, "p95_ms": float(np.percentile(samples, 95)) * 1000,
+                         "bytes": totals["bytes"], "hit_rate": totals["hits"] / cached if cached else None})
+        return rows
+
+    def prometheus_text(self):
+        import numpy as np
+        lines = ["# HELP couchpilot_call_seconds Laufzeit externer Aufrufe und Render-Abschnitte (gleitendes Fenster)",
+                 "# TYPE couchpilot_call_seconds summary"]
+        counters = {"errors": "couchpilot_call_errors_total", "bytes": "couchpilot_call_bytes_total",
+                    "hits": "couchpilot_cache_hits_total", "misses": "couchpilot_cache_misses_total"}
+        with self._lock:
+            items = [(key, list(samples), dict(self._totals[key])) for key, samples in sorted(self._samples.items())]
+        for key, samples, totals in items:
+            kind, name = key.split(":", 1)
+            labels = f'kind="{kind}",name="{name.replace(chr(34), "")}"'
+            for q in (0.5, 0.95):
+                lines.append(f'couchpilot_call_seconds{{{labels},quantile="{q}"}} {np.percentile(samples, q * 100):.6f}')
+            lines.append(f"couchpilot_call_seconds_sum{{{labels}}} {sum(samples):.6f}")
+            lines.append(f"couchpilot_call_seconds_count{{{labels}}} {totals['calls']}")
+            for field, metric in counters.items():
+                lines.append(f"{metric}{{{labels}}} {totals[field]}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path + ".tmp", "w", encoding="utf-8") as f: f.write(self.prometheus_text())
+        os.replace(path + ".tmp", path)
+
+    def flush(self):
+        with self._lock:
+            lines, self._lines = self._lines, []
+        if not lines or not self.jsonl_path: return
+        os.makedirs(os.path.dirname(self.jsonl_path) or ".", exist_ok=True)
+        with open(self.jsonl_path, "a", encoding="utf-8") as f: f.write("\n".join(lines) + "\n")
+
+# Ein Objekt pro Prozess: die Bibliotheksmodule melden hierher, auch aus Hintergrund-Threads
+METRICS = Metrics(jsonl_path=os.environ.get("COUCHPILOT_METRICS_JSONL"))
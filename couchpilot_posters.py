@@ -0,0 +1,185 @@
+import hashlib
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from PIL import Image
+from couchpilot_metrics import METRICS
+
+# --- GRÖSSEN ---
+# Breite in Pixeln, jeweils doppelt so groß wie angezeigt (scharf auf HiDPI-Bildschirmen).
+# "card": Spalte [1, 3] in den Ergebnis-Expandern, "thumb": width=100 in Watchlist/Gesehen.
+POSTER_SIZES = {"card": 342, "thumb": 200}
+SOURCE_BASE_URL = "https://image.tmdb.org/t/p/w500"
+WEBP_QUALITY = 80
+RETRY_AFTER = 600  # fehlgeschlagene Poster erst nach 10 min erneut anfragen
+
+def poster_key(poster_path, size):
+    digest = hashlib.sha1(poster_path.encode("utf-8")).hexdigest()[:20]
+    return f"{digest}_{size}"
+
+def make_thumbnails(content, sizes=POSTER_SIZES):
+    """Originalbild -> {größe: WebP-Bytes}. Kleiner als die Zielbreite wird nie hochskaliert."""
+    with Image.open(io.BytesIO(content)) as img:
+        img = img.convert("RGB")
+        out = {}
+        for name, width in sizes.items():
+            thumb = img.copy()
+            if thumb.width > width:
+                thumb = thumb.resize((width, round(thumb.height * width / thumb.width)), Image.LANCZOS)
+            buf = io.BytesIO()
+            thumb.save(buf, "WEBP", quality=WEBP_QUALITY, method=4)
+            out[name] = buf.getvalue()
+    return out
+
+class PosterCache:
+    """Poster einmal bei TMDB holen, als WebP in den benutzten Größen ablegen und danach
+    nur noch aus Speicher oder Platte ausliefern.
+
+    Beide Stufen sind LRU nach Gesamtgröße in Bytes. Die Platten-Reihenfolge wird beim Start
+    aus den Dateizeiten rekonstruiert, Treffer setzen die Zeit neu.
+    """
+
+    def __init__(self, directory, max_bytes=200 * 2**20, memory_bytes=32 * 2**20, session=None,
+                 source_base_url=SOURCE_BASE_URL, sizes=POSTER_SIZES, timeout=10):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self.session = session
+        self.source_base_url = source_base_url
+        self.sizes = sizes
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._fetching = {}
+        self._failed = {}
+        self._mem = OrderedDict()
+        self._mem_total = 0
+        self._disk = OrderedDict()
+        self._disk_total = 0
+        self.stats = {"memory": 0, "disk": 0, "fetched": 0, "failed": 0, "evicted": 0}
+        os.makedirs(directory, exist_ok=True)
+        entries = []
+        for entry in os.scandir(directory):
+            if entry.name.endswith(".webp"):
+                st = entry.stat()
+                entries.append((st.st_mtime, entry.name[:-5], st.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_total += size
+        self._evict_disk()
+
+    def _file(self, key):
+        return os.path.join(self.directory, f"{key}.webp")
+
+    def _remember(self, key, data):
+        if key in self._mem: self._mem_total -= len(self._mem.pop(key))
+        self._mem[key] = data
+        self._mem_total += len(data)
+        while self._mem_total > self.memory_bytes and len(self._mem) > 1:
+            _, old = self._mem.popitem(last=False)
+            self._mem_total -= len(old)
+
+    def _evict_disk(self):
+        while self._disk_total > self.max_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_total -= size
+            self.stats["evicted"] += 1
+            try: os.remove(self._file(key))
+            except FileNotFoundError: pass
+
+    def _lookup(self, key):
+        with self._lock:
+            data = self._mem.get(key)
+            if data is not None:
+                self._mem.move_to_end(key)
+                self.stats["memory"] += 1
+                return data
+            if key not in self._disk: return None
+        try:
+            with open(self._file(key), "rb") as f: data = f.read()
+            os.utime(self._file(key))
+        except OSError:
+            with self._lock:
+                self._disk_total -= self._disk.pop(key, 0)
+            return None
+        with self._lock:
+            if key in self._disk: self._disk.move_to_end(key)
+            self._remember(key, data)
+            self.stats["disk"] += 1
+        return data
+
+    def _store(self, poster_path, thumbs):
+        for size, data in thumbs.items():
+            key = poster_key(poster_path, size)
+            tmp = self._file(key) + ".tmp"
+            with open(tmp, "wb") as f: f.write(data)
+            os.replace(tmp, self._file(key))
+            with self._lock:
+                self._disk_total += len(data) - self._disk.pop(key, 0)
+                self._disk[key] = len(data)
+                self._remember(key, data)
+        with self._lock:
+            self._evict_disk()
+
+    def _fetch(self, poster_path):
+        """Lädt das Original genau einmal, auch wenn mehrere Sessions gleichzeitig danach fragen."""
+        with self._lock:
+            if time.time() - self._failed.get(poster_path, 0) < RETRY_AFTER: return
+            event = self._fetching.get(poster_path)
+            owner = event is None
+            if owner: event = self._fetching[poster_path] = threading.Event()
+        if not owner:
+            event.wait(self.timeout + 5)
+            return
+        t0 = time.perf_counter()
+        try:
+            response = (self.session or requests).get(f"{self.source_base_url}{poster_path}", timeout=self.timeout)
+            response.raise_for_status()
+            self._store(poster_path, make_thumbnails(response.content, self.sizes))
+            self.stats["fetched"] += 1
+            METRICS.record("poster", "download", time.perf_counter() - t0, len(response.content), "miss", start=t0)
+        except (requests.RequestException, OSError, ValueError) as e:
+            self.stats["failed"] += 1
+            self._failed[poster_path] = time.time()
+            METRICS.record("poster", "download", time.perf_counter() - t0, cache="miss", error=type(e).__name__, start=t0)
+        finally:
+            with self._lock: self._fetching.pop(poster_path, None)
+            event.set()
+
+    def get(self, poster_path, size="card"):
+        """WebP-Bytes des Posters in der gewünschten Größe oder None, wenn TMDB nicht liefert."""
+        if not poster_path or size not in self.sizes: return None
+        key = poster_key(poster_path, size)
+        data = self._lookup(key)
+        if data is None:
+            self._fetch(poster_path)
+            data = self._lookup(key)
+        return data
+
+    def warm(self, poster_paths, max_workers=8):
+        """Fehlende Poster einer Ergebnisseite parallel holen, bevor sie gerendert werden."""
+        with self._lock:
+            todo = list(dict.fromkeys(p for p in poster_paths if p and poster_key(p, next(iter(self.sizes))) not in self._disk))
+        if not todo: return
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(todo))) as pool:
+            list(pool.map(self._fetch, todo))
+
+    def clear(self):
+        with self._lock:
+            keys = list(self._disk)
+            self._disk.clear()
+            self._disk_total = 0
+            self._mem.clear()
+            self._mem_total = 0
+            self._failed.clear()
+        for key in keys:
+            try: os.remove(self._file(key))
+            except FileNotFoundError: pass
+
+    def summary(self):
+        with self._lock:
+            return {**self.stats, "disk_items": len(self._disk), "disk_bytes": self._disk_total,
+                    "memory_items": len(self._mem), "memory_bytes": self._mem_total}
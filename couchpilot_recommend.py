@@ -0,0 +1,218 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from couchpilot_library import normalize_title
+from couchpilot_tmdb import details_url, media_kind
+
+# --- MERKMALE ---
+DECADE_EDGES = [1960, 1970, 1980, 1990, 2000, 2010, 2020]  # -> 8 Jahrzehnt-Fächer, davor alles in einem
+BLOCK_WEIGHTS = {"genre": 1.0, "cast": 1.2, "decade": 0.4}
+VOTE_WEIGHT = 0.15     # wie stark die TMDB-Bewertung in die Reihenfolge eingeht
+UNRATED_WEIGHT = 0.3   # gesehen, aber nicht bewertet -> leichtes Interesse
+
+def item_year(item):
+    date = str(item.get('release_date') or item.get('first_air_date') or "")[:4]
+    return int(date) if date.isdigit() else None
+
+def item_genres(item):
+    # Listen liefern genre_ids, Detailseiten genres=[{id, name}]
+    return item.get('genre_ids') or [g['id'] for g in item.get('genres', [])]
+
+class FeatureSpace:
+    """Feste Spaltenaufteilung für Merkmalsvektoren: Genres (GENRE_MAP), Besetzung (gehasht), Jahrzehnt.
+
+    Jeder Block wird für sich normiert und gewichtet, damit zwanzig Schauspieler nicht die Genres erdrücken.
+    """
+
+    def __init__(self, genre_ids, cast_buckets=1024, weights=BLOCK_WEIGHTS):
+        self.genre_col = {g: i for i, g in enumerate(genre_ids)}
+        self.cast_buckets = cast_buckets
+        self.weights = weights
+        n_genres, n_decades = len(self.genre_col), len(DECADE_EDGES) + 1
+        self.blocks = {"genre": slice(0, n_genres), "cast": slice(n_genres, n_genres + cast_buckets),
+                       "decade": slice(n_genres + cast_buckets, n_genres + cast_buckets + n_decades)}
+        self.dim = n_genres + cast_buckets + n_decades
+
+    def encode(self, items):
+        """Liste von TMDB-Einträgen -> (merkmale float32 [n, dim], tmdb-bewertung/10 [n])."""
+        rows, cols, vals = [], [], []
+        cast0, dec0 = self.blocks["cast"].start, self.blocks["decade"].start
+        for r, item in enumerate(items):
+            for g in item_genres(item):
+                if g in self.genre_col: rows.append(r); cols.append(self.genre_col[g]); vals.append(1.0)
+            for pos, person in enumerate((item.get('credits') or {}).get('cast', [])):
+                rows.append(r); cols.append(cast0 + person['id'] % self.cast_buckets); vals.append(1.0 / (1.0 + 0.3 * pos))
+            year = item_year(item)
+            if year: rows.append(r); cols.append(dec0 + int(np.searchsorted(DECADE_EDGES, year, "right"))); vals.append(1.0)
+        features = np.zeros((len(items), self.dim), dtype=np.float32)
+        np.add.at(features, (np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)), np.asarray(vals, dtype=np.float32))
+        for name, sl in self.blocks.items():
+            norms = np.linalg.norm(features[:, sl], axis=1, keepdims=True)
+            features[:, sl] *= self.weights[name] / np.maximum(norms, 1e-6)
+        votes = np.array([float(item.get('vote_average') or 0) / 10 for item in items], dtype=np.float32)
+        return features, votes
+
+# --- EMPFEHLUNGEN ---
+class Recommender:
+    """Empfehlungen aus der Gesehen-Liste, komplett lokal gerechnet.
+
+    Im Hintergrund werden Details + Besetzung der gesehenen Titel und ein Kandidatenpool
+    (TMDB-Empfehlungen zu den Lieblingen, populär und top bewertet) geladen und einmal in
+    Merkmalsvektoren umgerechnet. rank() ist danach reines NumPy ohne weitere API-Aufrufe.
+    """
+
+    def __init__(self, space, fetch_json, base_url, api_key, pool_ttl=6 * 3600, seeds=20, max_workers=8):
+        self.space = space
+        self.fetch_json = fetch_json
+        self.base_url = base_url
+        self.api_key = api_key
+        self.pool_ttl = pool_ttl
+        self.seeds = seeds
+        self.max_workers = max_workers
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._seen = {}       # sheet-id -> (media, id)
+        self._features = {}   # (media, id) -> (merkmale, bewertung, eintrag); jeder Titel wird nur einmal kodiert
+        self._pool = {"keys": [], "ids": np.empty(0, dtype=object), "media": np.empty(0, dtype=object),
+                      "features": np.zeros((0, space.dim), dtype=np.float32), "votes": np.zeros(0, dtype=np.float32),
+                      "items": [], "built_at": None}
+
+    # Laden (Hintergrund)
+    def _details(self, media, m_id):
+        return self.fetch_json(details_url(self.base_url, self.api_key, {'id': m_id, 'media_type': media}))
+
+    def _resolve_seen(self, record):
+        """Das Sheet kennt nur die ID. Film zuerst, passt der Titel nicht, als Serie versuchen."""
+        m_id = str(record['id']).replace('.0', '')
+        wanted = normalize_title(record.get('title'))
+        fallback = None
+        for media in ("movie", "tv"):
+            data = self._details(media, m_id)
+            if not data.get('id'): continue
+            data['media_type'] = media
+            if not wanted or normalize_title(data.get('title') or data.get('name')) == wanted: return record['id'], data
+            fallback = fallback or data
+        return record['id'], fallback
+
+    def _encode(self, items):
+        items = [it for it in items if (media_kind(it), str(it['id'])) not in self._features]
+        if not items: return
+        for it in items:
+            credits = it.get('credits') or {}
+            it['credits'] = {'cast': credits.get('cast', [])[:6]}
+        features, votes = self.space.encode(items)
+        with self._lock:
+            for it, f, v in zip(items, features, votes):
+                self._features[(media_kind(it), str(it['id']))] = (f, v, it)
+
+    def _candidates(self, seeds):
+        urls = [f"{self.base_url}/{media}/{m_id}/recommendations?api_key={self.api_key}&language=de-DE" for media, m_id in seeds]
+        for media in ("movie", "tv"):
+            for page in (1, 2, 3):
+                urls.append(f"{self.base_url}/discover/{media}?api_key={self.api_key}&language=de-DE&sort_by=popularity.desc&vote_count.gte=100&page={page}")
+            for page in (1, 2):
+                urls.append(f"{self.base_url}/{media}/top_rated?api_key={self.api_key}&language=de-DE&page={page}")
+        found = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for url, data in zip(urls, pool.map(self.fetch_json, urls)):
+                media = "tv" if "/tv/" in url or "/discover/tv" in url else "movie"
+                for it in data.get('results', []):
+                    if it.get('id'): found.setdefault((media, str(it['id'])), {**it, 'media_type': media})
+        return list(found.values())
+
+    def _build(self, seen_records):
+        try:
+            todo = [r for r in seen_records if self._seen.get(r['id']) is None]  # neu oder früher nicht gefunden
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                resolved = list(pool.map(self._resolve_seen, todo))
+            self._encode([data for _, data in resolved if data])
+            with self._lock:
+                # Nicht auffindbare Titel merken (None), sonst würde jeder Aufruf neu bauen
+                for sid, data in resolved: self._seen[sid] = (data['media_type'], str(data['id'])) if data else None
+                rated = sorted(seen_records, key=lambda r: -float(r.get('user_rating') or 0))
+                seeds = [self._seen[r['id']] for r in rated if self._seen.get(r['id'])][:self.seeds]
+
+            candidates = [it for it in self._candidates(seeds) if (it['media_type'], str(it['id'])) not in self._features]
+            # Besetzung über die Detail-Aufrufe (gecacht), danach bleibt jeder Kandidat kodiert im Speicher
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                for it, data in zip(candidates, pool.map(lambda it: self._details(it['media_type'], str(it['id'])), candidates)):
+                    it['credits'] = data.get('credits') or {}
+            self._encode(candidates)
+            with self._lock: seen_keys = set(self._seen.values())
+            pool_keys = [k for k in self._features if k not in seen_keys]
+            self._set_pool(pool_keys)
+            self.last_error = None
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+
+    def _set_pool(self, keys):
+        with self._lock:
+            entries = [self._features[k] for k in keys]
+            self._pool = {
+                "keys": keys,
+                "ids": np.array([k[1] for k in keys], dtype=object),
+                "media": np.array([k[0] for k in keys], dtype=object),
+                "features": np.stack([e[0] for e in entries]) if entries else np.zeros((0, self.space.dim), dtype=np.float32),
+                "votes": np.array([e[1] for e in entries], dtype=np.float32),
+                "items": [e[2] for e in entries],
+                "built_at": time.time(),
+            }
+
+    def ensure(self, seen_records):
+        """Startet einen Hintergrund-Aufbau, wenn neue gesehene Titel dazukamen oder der Pool alt ist."""
+        built_at = self._pool["built_at"]
+        stale = built_at is None or time.time() - built_at > self.pool_ttl
+        new_seen = any(r['id'] not in self._seen for r in seen_records)
+        if not (stale or new_seen): return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive(): return
+            self._thread = threading.Thread(target=self._build, args=(list(seen_records),), name="recommender", daemon=True)
+            self._thread.start()
+
+    def building(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def status(self):
+        with self._lock:
+            return {"pool": len(self._pool["keys"]), "seen": len(self._seen), "built_at": self._pool["built_at"],
+                    "building": self.building(), "error": self.last_error}
+
+    # Rangfolge (pro Anfrage, nur NumPy)
+    def profile(self, seen_records):
+        """Bewertungsgewichteter Mittelwert der gesehenen Titel: 10 zieht an, 0-4 stößt ab."""
+        with self._lock:
+            rows, weights = [], []
+            for r in seen_records:
+                key = self._seen.get(r['id'])
+                if key is None or key not in self._features: continue
+                rating = float(r.get('user_rating') or 0)
+                rows.append(self._features[key][0])
+                weights.append((rating - 5.0) / 5.0 if rating > 0 else UNRATED_WEIGHT)
+        if not rows: return None
+        profile = np.asarray(weights, dtype=np.float32) @ np.stack(rows)
+        norm = np.linalg.norm(profile)
+        return profile / norm if norm > 0 else None
+
+    def rank(self, seen_records, exclude_ids=(), media=None, min_vote=0.0, genre_id=None, limit=15):
+        """Beste Kandidaten für die Gesehen-Liste; Filter wie im Entdecker-Modus. Liefert (eintrag, score)-Paare."""
+        profile = self.profile(seen_records)
+        pool = self._pool
+        if profile is None or not len(pool["keys"]): return []
+        scores = pool["features"] @ profile + VOTE_WEIGHT * pool["votes"]
+        # Gesehene Titel mit bekanntem Typ als (media, id) ausschließen – Film 603 ist nicht Serie 603;
+        # nur für den Rest (z.B. Watchlist, Typ unbekannt) bleibt der Vergleich über die nackte ID
+        with self._lock: known = {str(sid).replace('.0', ''): key for sid, key in self._seen.items() if key}
+        ids = [str(i).replace('.0', '') for i in exclude_ids]
+        pairs = {known[i] for i in ids if i in known}
+        mask = ~np.isin(pool["ids"], np.array([i for i in ids if i not in known], dtype=object))
+        mask &= np.fromiter((k not in pairs for k in pool["keys"]), dtype=bool, count=len(pool["keys"]))
+        if media: mask &= pool["media"] == media
+        if min_vote: mask &= pool["votes"] >= min_vote / 10
+        if genre_id is not None and genre_id in self.space.genre_col:
+            mask &= pool["features"][:, self.space.genre_col[genre_id]] > 0
+        hits = np.flatnonzero(mask)
+        if len(hits) > limit: hits = hits[np.argpartition(-scores[hits], limit)[:limit]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(pool["items"][i], float(scores[i])) for i in hits]
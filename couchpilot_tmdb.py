@@ -0,0 +1,302 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qsl, urlencode
+import requests
+from requests.adapters import HTTPAdapter
+from couchpilot_cache import Singleflight
+from couchpilot_metrics import METRICS
+
+# --- TTL PRO ENDPUNKT ---
+# (Muster auf den Pfad ohne /3, Lebensdauer in Sekunden). Erster Treffer gewinnt.
+DAY = 24 * 3600
+ENDPOINT_TTLS = [
+    ("credits", re.compile(r"/credits$"), 30 * DAY),        # Besetzung ändert sich praktisch nie
+    ("details", re.compile(r"^/(movie|tv|person)/\d+$"), 7 * DAY),
+    ("discover", re.compile(r"^/discover/"), DAY),         # Popularität wechselt täglich
+    ("search", re.compile(r"^/search/"), DAY),
+    ("trending", re.compile(r"^/trending/"), 6 * 3600),
+]
+DEFAULT_TTL = ("other", DAY)
+
+def cache_key(url):
+    """Schlüssel ohne api_key und mit sortierten Parametern, damit gleiche Anfragen zusammenfallen."""
+    parts = urlsplit(url)
+    params = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k != "api_key")
+    path = re.sub(r"^/3(?=/)", "", parts.path)
+    return f"{path}?{urlencode(params)}" if params else path
+
+def endpoint_ttl(key):
+    path = key.split("?", 1)[0]
+    for name, pattern, ttl in ENDPOINT_TTLS:
+        if pattern.search(path): return name, ttl
+    return DEFAULT_TTL
+
+# --- CACHE ---
+class TmdbCache:
+    """Zweistufiger TMDB-Antwort-Cache, den alle Sessions des Prozesses teilen.
+
+    Vorne ein LRU im Speicher, dahinter SQLite auf der Platte (überlebt Neustarts).
+    Gespeichert wird der JSON-Text, jeder Treffer liefert also eine frische Kopie.
+    """
+
+    def __init__(self, path, max_items=2000, purge_every=200):
+        self.path = path
+        self.max_items = max_items
+        self.purge_every = purge_every
+        self._mem = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.stats = {"memory": 0, "disk": 0, "miss": 0, "stored": 0}
+        self.flight = Singleflight()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, endpoint TEXT, body TEXT, expires REAL)")
+        self._db.commit()
+
+    def _remember(self, key, expires, body):
+        self._mem[key] = (expires, body)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_items: self._mem.popitem(last=False)
+
+    def get(self, url):
+        key = cache_key(url)
+        now = time.time()
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry and entry[0] > now:
+                self._mem.move_to_end(key)
+                self.stats["memory"] += 1
+                return json.loads(entry[1])
+            row = self._db.execute("SELECT expires, body FROM responses WHERE key = ?", (key,)).fetchone()
+            if row and row[0] > now:
+                self._remember(key, row[0], row[1])
+                self.stats["disk"] += 1
+                return json.loads(row[1])
+            self.stats["miss"] += 1
+        return None
+
+    def set(self, url, data):
+        key = cache_key(url)
+        endpoint, ttl = endpoint_ttl(key)
+        expires = time.time() + ttl
+        body = json.dumps(data, ensure_ascii=False)
+        with self._lock:
+            self._remember(key, expires, body)
+            self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)", (key, endpoint, body, expires))
+            self._writes += 1
+            if self._writes % self.purge_every == 0:
+                self._db.execute("DELETE FROM responses WHERE expires < ?", (time.time(),))
+            self._db.commit()
+            self.stats["stored"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+    def summary(self):
+        hits = self.stats["memory"] + self.stats["disk"]
+        total = hits + self.stats["miss"]
+        with self._lock:
+            rows = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {**self.stats, "hit_rate": hits / total if total else 0.0, "memory_items": len(self._mem), "disk_items": rows,
+                "joined": self.flight.stats["joined"]}
+
+# --- HTTP ---
+def make_session(pool_size=8):
+    """Gemeinsame Session: Keep-Alive über alle Downloads, gzip kommt von requests automatisch."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Accept-Encoding": "gzip, deflate"})
+    return session
+
+# --- RATE LIMIT ---
+class RateLimiter:
+    """Token-Bucket für echte Netzwerkaufrufe. TMDB erlaubt grob 40-50 Anfragen pro Sekunde und IP.
+
+    Mit parent zählt jeder Aufruf zusätzlich gegen das übergeordnete Budget: ein Hintergrund-Limiter
+    mit kleinerer Rate bremst nur sich selbst, der Rest des gemeinsamen Budgets bleibt der Oberfläche.
+    """
+
+    def __init__(self, rate=40, burst=None, parent=None):
+        self.rate = rate
+        self.burst = burst or rate
+        self.parent = parent
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    break
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+        if self.parent: self.parent.acquire()
+
+def _download_json(url, cache, session, timeout, limiter):
+    if limiter: limiter.acquire()
+    endpoint = endpoint_ttl(cache_key(url))[0]
+    t0 = time.perf_counter()
+    try:
+        response = (session or requests).get(url, timeout=timeout)
+        if response.status_code != 200:
+            METRICS.record("tmdb", endpoint, time.perf_counter() - t0, len(response.content), "miss", f"HTTP {response.status_code}", t0)
+            return {}
+        data = response.json()
+    except (requests.RequestException, ValueError) as e:
+        METRICS.record("tmdb", endpoint, time.perf_counter() - t0, cache="miss", error=type(e).__name__, start=t0)
+        return {}
+    METRICS.record("tmdb", endpoint, time.perf_counter() - t0, len(response.content), "miss", start=t0)
+    if cache: cache.set(url, data)
+    return data
+
+def cached_get_json(url, cache=None, session=None, timeout=5, limiter=None):
+    """GET auf TMDB mit Cache davor. Nur erfolgreiche Antworten werden gespeichert; Fehler -> {}.
+
+    Laufen mehrere Sessions gleichzeitig auf dieselbe URL, geht nur eine Anfrage raus (Singleflight),
+    die Wartenden bekommen eine eigene Kopie der Antwort.
+    """
+    if not cache: return _download_json(url, None, session, timeout, limiter)
+    t0 = time.perf_counter()
+    hit = cache.get(url)
+    if hit is not None:
+        METRICS.record("tmdb", endpoint_ttl(cache_key(url))[0], time.perf_counter() - t0, cache="hit", start=t0)
+        return hit
+    data, leader = cache.flight.do(cache_key(url), lambda: _download_json(url, cache, session, timeout, limiter))
+    if leader: return data
+    METRICS.record("tmdb", endpoint_ttl(cache_key(url))[0], time.perf_counter() - t0, cache="joined", start=t0)
+    return json.loads(json.dumps(data))
+
+# --- BESETZUNG VORAB LADEN ---
+def media_kind(item):
+    return item.get('media_type') or ('movie' if 'title' in item else 'tv')
+
+def details_url(base_url, api_key, item, append="credits", language="de-DE"):
+    m_id = str(item['id']).replace('.0', '')
+    return f"{base_url}/{media_kind(item)}/{m_id}?api_key={api_key}&language={language}&append_to_response={append}"
+
+def attach_credits(items, base_url, api_key, cache=None, session=None, limiter=None, max_workers=8, cast_limit=6):
+    """Holt Details + Besetzung einer ganzen Ergebnisseite parallel (ein Aufruf pro Titel dank
+    append_to_response=credits) und hängt sie als item['credits'] an. Das Rendern braucht danach kein Netzwerk."""
+    todo = [m for m in items if 'credits' not in m and m.get('id') and media_kind(m) in ('movie', 'tv')]
+    if not todo: return items
+
+    def _one(m):
+        return cached_get_json(details_url(base_url, api_key, m), cache, session, limiter=limiter)
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(todo))) as pool:
+        for m, data in zip(todo, pool.map(_one, todo)):
+            m['credits'] = {'cast': (data.get('credits') or {}).get('cast', [])[:cast_limit]}
+    return items
+
+# --- DISCOVER SEITENWEISE ---
+RE_PAGE_PARAM = re.compile(r"&page=\d+")
+
+def page_url(url, page):
+    return RE_PAGE_PARAM.sub("", url) + f"&page={page}"
+
+class DiscoverStream:
+    """Blättert durch eine discover-Abfrage für eine Session.
+
+    Pro Runde werden mehrere Seiten parallel geholt, bereits gezeigte und eigene Titel
+    (Watchlist/Gesehen als Menge) fallen heraus. Angereichert (Besetzung, Poster) wird nur,
+    was tatsächlich gezeigt wird: der Ausschnitt von next_batch() bzw. der, den prefetch()
+    im Hintergrund für den nächsten Klick vorbereitet.
+    """
+
+    def __init__(self, url, fetch_json, enrich=None, executor=None, batch_size=15, pages_per_round=3, max_pages=500):
+        self.url = url
+        self.fetch_json = fetch_json
+        self.enrich = enrich
+        self.executor = executor
+        self.batch_size = batch_size
+        self.pages_per_round = pages_per_round
+        self.next_page = 1
+        self.total_pages = max_pages
+        self.buffer = []
+        self.shown = set()
+        self._enriched = set()
+        self._pending = None
+
+    @property
+    def exhausted(self):
+        return not self.buffer and self._pending is None and self.next_page > self.total_pages
+
+    def _pages(self):
+        pages = list(range(self.next_page, min(self.next_page + self.pages_per_round, self.total_pages + 1)))
+        if pages: self.next_page = pages[-1] + 1
+        return pages
+
+    def _round(self, pages, exclude):
+        if not pages: return None, None
+        with ThreadPoolExecutor(max_workers=len(pages)) as pool:
+            datas = list(pool.map(self.fetch_json, [page_url(self.url, p) for p in pages]))
+        total = min((d.get('total_pages') for d in datas if d.get('total_pages')), default=None)
+        return total, [m for d in datas for m in d.get('results', []) if str(m.get('id')) not in exclude]
+
+    def _enrich_new(self, items):
+        todo = [m for m in items if str(m.get('id')) not in self._enriched]
+        if self.enrich and todo: self.enrich(todo)
+        self._enriched.update(str(m.get('id')) for m in todo)
+
+    def _prepare(self, pages, exclude, staged, shown):
+        """Hintergrund: ggf. die nächste Runde holen und genau die Titel des nächsten Ausschnitts anreichern."""
+        total, items = self._round(pages, exclude)
+        upcoming, ids = list(staged), set(shown)
+        for m in items or []:
+            # Dieselben Objekte wie später in _take (erstes Vorkommen gewinnt), sonst fehlt dort die Besetzung
+            if len(upcoming) >= self.batch_size: break
+            if str(m.get('id')) not in ids:
+                ids.add(str(m.get('id')))
+                upcoming.append(m)
+        self._enrich_new(upcoming)
+        return total, items
+
+    def _take(self, result, exclude):
+        total, items = result
+        if items is None: return  # nur angereichert, keine neue Runde
+        if total: self.total_pages = min(self.total_pages, total)
+        for m in items:
+            m_id = str(m.get('id'))
+            # Erneut filtern: seit dem Vorladen kann etwas auf die Watchlist gewandert sein
+            if m_id in exclude or m_id in self.shown: continue
+            self.shown.add(m_id)
+            self.buffer.append(m)
+        if not items and not total: self.total_pages = self.next_page - 1  # Fehler/leer -> Ende
+
+    def next_batch(self, exclude=frozenset()):
+        """Nächste batch_size neue Titel, angereichert. Nimmt zuerst die vorgeladene Runde."""
+        if self._pending is not None:
+            future, self._pending = self._pending, None
+            self._take(future.result(), exclude)
+        while len(self.buffer) < self.batch_size:
+            pages = self._pages()
+            if not pages: break
+            self._take(self._round(pages, exclude), exclude)
+        batch, self.buffer = self.buffer[:self.batch_size], self.buffer[self.batch_size:]
+        self._enrich_new(batch)
+        return batch
+
+    def prefetch(self, exclude=frozenset()):
+        """Bereitet den nächsten Ausschnitt im Hintergrund vor (Seiten nur, wenn der Puffer nicht reicht)."""
+        if self._pending is not None or not self.executor: return
+        pages = self._pages() if len(self.buffer) < self.batch_size else []
+        staged = self.buffer[:self.batch_size]
+        if not pages and all(str(m.get('id')) in self._enriched for m in staged): return
+        self._pending = self.executor.submit(self._prepare, pages, frozenset(exclude), list(staged), set(self.shown))
@@ -2,9 +2,12 @@ import tkinter as tk
 from tkinter import scrolledtext
 import subprocess
 import threading
+import queue
+import time
+import re
 import sys
 import os
-import shutil
+from concurrent.futures import ThreadPoolExecutor
 
 # --- KONFIGURATION ---
 SOURCE_FOLDER = r"I:\01_Listen"  # Quelle deiner Excel-Dateien
@@ -12,94 +15,282 @@ FILES_TO_SYNC = [
     "Filme_Rosi_2025_DE.xlsx",
     "Serien_Rosi_2025.xlsx"
 ]
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))  # Git-Repo der Cloud-App (hier liegt auch dieses Skript)
+STEP_TIMEOUTS = {"pull": 180, "add": 60, "commit": 60, "push": 900}  # Sekunden je Git-Schritt
 # ---------------------
 
+POLL_MS = 50  # so oft holt die Oberfläche neue Zeilen aus der Warteschlange
+RE_PROGRESS = re.compile(r"\d+% \(\d+/\d+\)")  # "Writing objects:  42% (21/50)" -> nur Statuszeile, kein Log
+
+# --- BEFEHLE AUSFÜHREN ---
+class CommandRunner:
+    """Startet einen Befehl und reicht stdout/stderr Zeile für Zeile weiter, während er läuft.
+
+    emit(stream, zeile) wird aus den Lese-Threads aufgerufen und darf die Oberfläche nicht
+    direkt anfassen. Zeitlimit oder Abbruch beenden den Prozess (terminate, notfalls kill).
+    """
+
+    def __init__(self, emit, cancel_event, cwd=None):
+        self.emit = emit
+        self.cancel_event = cancel_event
+        self.cwd = cwd
+
+    def _pump(self, stream, name):
+        # Textmodus: "\r" der Git-Fortschrittsanzeige zählt als Zeilenende -> jede Aktualisierung kommt sofort
+        for line in iter(stream.readline, ""):
+            line = line.rstrip()
+            if line: self.emit(name, line)
+        stream.close()
+
+    def _stop(self, p):
+        p.terminate()
+        try: p.wait(timeout=3)
+        except subprocess.TimeoutExpired: p.kill()
+
+    def run(self, args, timeout=None):
+        """Liefert den Exit-Code, -1 bei Startfehlern und None bei Zeitlimit/Abbruch."""
+        # Creationflags verhindern aufpoppende Fenster
+        flags = 0x08000000 if sys.platform == "win32" else 0
+        try:
+            p = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding="utf-8",
+                                 errors="replace", bufsize=1, creationflags=flags, cwd=self.cwd)
+        except OSError as e:
+            self.emit("err", f"❌ Systemfehler: {e}")
+            return -1
+        readers = [threading.Thread(target=self._pump, args=(p.stdout, "out"), daemon=True),
+                   threading.Thread(target=self._pump, args=(p.stderr, "err"), daemon=True)]
+        for t in readers: t.start()
+
+        deadline = time.monotonic() + timeout if timeout else None
+        reason = None
+        while p.poll() is None:
+            if self.cancel_event.is_set(): reason = "Abgebrochen."
+            elif deadline and time.monotonic() > deadline: reason = f"Zeitlimit ({timeout}s) überschritten – abgebrochen."
+            if reason:
+                self._stop(p)
+                break
+            self.cancel_event.wait(0.1)
+        for t in readers: t.join(timeout=2)
+        if reason:
+            self.emit("err", f"⏹️ {reason}")
+            return None
+        return p.returncode
+
 class GitUploaderApp:
     def __init__(self, root):
         self.root = root
         self.root.title("CouchPilot Cloud Sync")
         self.root.geometry("600x450")
-        
+        # Worker-Threads schreiben nur in diese Warteschlange; Tk-Widgets fasst allein der Tk-Thread an (_drain)
+        self.ui_queue = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.runner = CommandRunner(self._emit, self.cancel_event, cwd=REPO_DIR)
+
         tk.Label(root, text="CouchPilot Cloud Upload", font=("Arial", 14, "bold")).pack(pady=10)
-        
+
         self.txt_log = scrolledtext.ScrolledText(root, state='disabled', height=15)
         self.txt_log.pack(padx=10, pady=5, fill="both", expand=True)
 
-        self.btn_start = tk.Button(root, text="1. Daten holen & 2. Hochladen", command=self.start_update_thread, 
+        self.btn_start = tk.Button(root, text="1. Daten holen & 2. Hochladen", command=self.start_update_thread,
                                    bg="#4CAF50", fg="white", font=("Arial", 12, "bold"))
-        self.btn_start.pack(pady=10, fill="x", padx=50)
+        self.btn_start.pack(pady=(10, 0), fill="x", padx=50)
+        self.btn_cancel = tk.Button(root, text="Abbrechen", command=self.cancel, state="disabled")
+        self.btn_cancel.pack(pady=5)
 
         self.lbl_status = tk.Label(root, text="Bereit.", fg="gray")
         self.lbl_status.pack(pady=5)
+        self.root.after(POLL_MS, self._drain)
 
+    # --- Oberfläche (threadsicher über die Warteschlange) ---
     def log(self, message):
+        self.ui_queue.put(("log", message))
+
+    def set_status(self, text, color):
+        self.ui_queue.put(("status", text, color))
+
+    def set_running(self, running):
+        self.ui_queue.put(("running", running))
+
+    def _emit(self, stream, line):
+        # Fortschrittszeilen von Git (stderr) nur in der Statuszeile, Endstände ("..., done.") ins Log
+        if stream == "err" and RE_PROGRESS.search(line) and not line.endswith("done."): self.set_status(line, "blue")
+        else: self.log(line)
+
+    def _drain(self):
+        lines = []
+        try:
+            while True:
+                kind, *args = self.ui_queue.get_nowait()
+                if kind == "log":
+                    lines.append(args[0])
+                    continue
+                self._flush_log(lines)
+                lines = []
+                if kind == "status": self.lbl_status.config(text=args[0], fg=args[1])
+                elif kind == "running":
+                    self.btn_start.config(state="disabled" if args[0] else "normal")
+                    self.btn_cancel.config(state="normal" if args[0] else "disabled")
+        except queue.Empty:
+            pass
+        self._flush_log(lines)
+        self.root.after(POLL_MS, self._drain)
+
+    def _flush_log(self, lines):
+        # Viele Zeilen auf einmal einfügen statt je Zeile neu zu zeichnen
+        if not lines: return
         self.txt_log.config(state='normal')
-        self.txt_log.insert(tk.END, message + "\n")
+        self.txt_log.insert(tk.END, "\n".join(lines) + "\n")
         self.txt_log.see(tk.END)
         self.txt_log.config(state='disabled')
 
-    def copy_files(self):
-        self.log("--- SCHRITT 1: Kopiere Excel-Dateien ---")
+    # --- Schritte ---
+    def prepare_sources(self):
+        """Liest und hasht die Excel-Dateien (läuft parallel zu git pull).
+
+        Eingelesen wird nur, was sich gegenüber dem lokalen Manifest geändert hat. Liefert
+        {datei: {"content", "sha256", "df"}} oder None bei einem Fehler.
+        """
         if not os.path.exists(SOURCE_FOLDER):
             self.log(f"❌ Quelle nicht gefunden: {SOURCE_FOLDER}")
-            return False
-            
-        count = 0
+            return None
+        try:
+            from couchpilot_library import MANIFEST_PATH, category_for_url, parse_workbook, read_manifest, sha256_bytes
+        except ImportError as e:
+            self.log(f"❌ {e} – bitte einmal 'pip install -r requirements.txt' ausführen")
+            return None
+
+        known = read_manifest(os.path.join(REPO_DIR, MANIFEST_PATH))["files"]
+        sources = {}
         for f in FILES_TO_SYNC:
+            if self.cancel_event.is_set(): return None
             src = os.path.join(SOURCE_FOLDER, f)
-            if os.path.exists(src):
-                try:
-                    shutil.copy2(src, f)
-                    self.log(f"✅ Kopiert: {f}")
-                    count += 1
+            if not os.path.exists(src):
+                self.log(f"⚠️ Datei fehlt in Quelle: {f}")
+                continue
+            with open(src, "rb") as fh: content = fh.read()
+            entry = {"content": content, "sha256": sha256_bytes(content), "df": None}
+            if known.get(f, {}).get("sha256") != entry["sha256"]:
+                try: entry["df"] = parse_workbook(content, category_for_url(f))
                 except Exception as e:
                     self.log(f"❌ Fehler bei {f}: {e}")
-            else:
-                self.log(f"⚠️ Datei fehlt in Quelle: {f}")
-        return count > 0
+                    continue
+            self.log(f"📄 Gelesen: {f} ({len(content) / 2**20:.1f} MB{', geändert' if entry['df'] is not None else ''})")
+            sources[f] = entry
+        return sources
+
+    def export_snapshots(self, sources):
+        """Schreibt geänderte Listen als CSV-Partitionen + Manifest ins Repo.
+
+        Verglichen wird mit dem Manifest nach dem Pull; unveränderte Dateien (gleicher SHA-256)
+        werden übersprungen. Liefert die geänderten Repo-Pfade (leer = nichts zu tun).
+        """
+        from couchpilot_library import MANIFEST_PATH, export_partitions, read_manifest, write_manifest
+        self.log("--- SCHRITT 2: Snapshots schreiben ---")
+        manifest_file = os.path.join(REPO_DIR, MANIFEST_PATH)
+        manifest = read_manifest(manifest_file)
+        changed, exported = [], 0
+        for f, entry in sources.items():
+            if manifest["files"].get(f, {}).get("sha256") == entry["sha256"]:
+                self.log(f"⏭️ Unverändert: {f}")
+                continue
+            try:
+                written, removed = export_partitions(entry["content"], f, REPO_DIR, manifest, entry["df"])
+            except Exception as e:
+                self.log(f"❌ Fehler bei {f}: {e}")
+                continue
+            exported += 1
+            total = len(manifest["files"][f]["partitions"])
+            self.log(f"✅ {f}: {len(written)} von {total} Blättern geändert" + (f", {len(removed)} entfernt" if removed else ""))
+            changed += written + removed
+        if exported:
+            write_manifest(manifest_file, manifest)
+            changed.append(MANIFEST_PATH)
+        return changed
 
-    def git_cmd(self, args, desc):
+    def git_cmd(self, args, desc, step):
         self.log(f"--- {desc} ---")
+        return self.runner.run(args, timeout=STEP_TIMEOUTS.get(step))
+
+    def run_process(self):
         try:
-            # Creationflags verhindern aufpoppende Fenster
-            flags = 0x08000000 if sys.platform == "win32" else 0
-            p = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, creationflags=flags)
-            out, err = p.communicate()
-            if out: self.log(out.strip())
-            if err: self.log(err.strip())
-            return p.returncode
+            self._run()
         except Exception as e:
-            self.log(f"❌ Systemfehler: {e}")
-            return -1
+            self.log(f"\n❌ Unerwarteter Fehler: {e}")
+            self.set_status("Fehler", "red")
+        finally:
+            self.set_running(False)
 
-    def run_process(self):
-        if not self.copy_files():
-            self.lbl_status.config(text="Fehler beim Kopieren", fg="red")
-            self.btn_start.config(state="normal")
+    def _run(self):
+        # Excel-Dateien lesen (oft vom Netzlaufwerk) und Git Pull laufen gleichzeitig;
+        # geschrieben wird erst danach, verglichen mit dem frisch geholten Manifest
+        self.log("--- SCHRITT 1: Git Pull (Aktualisieren) + Listen lesen ---")
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            prepared = pool.submit(self.prepare_sources)
+            code = self.runner.run(["git", "pull", "--progress"], timeout=STEP_TIMEOUTS["pull"])
+            sources = prepared.result()
+        if self.cancel_event.is_set():
+            self.set_status("Abgebrochen.", "orange")
+            return
+        if code != 0:
+            self.log("\n❌ Pull fehlgeschlagen – ohne aktuellen Stand wird nichts hochgeladen.")
+            self.set_status("Fehler beim Aktualisieren", "red")
             return
+        if sources is None:
+            self.set_status("Fehler beim Lesen der Listen", "red")
+            return
+
+        changed = self.export_snapshots(sources)
+        if not changed:
+            self.log("\n✅ Keine Änderungen – nichts hochzuladen.")
+            self.set_status("Alles aktuell.", "green")
+            return
+
+        # Git Workflow: nur der Snapshot-Ordner, keine Excel-Dateien mehr
+        from couchpilot_library import PARTITION_DIR
+        code = self.git_cmd(["git", "add", "-A", "--", PARTITION_DIR], "Git Add (Vorbereiten)", "add")
+        if code != 0: return self.stop_after("Git Add", code)
+        # Exit-Code statt Git-Meldung auswerten ("nothing to commit" ist je nach Sprache anders formuliert)
+        staged = self.runner.run(["git", "diff", "--cached", "--quiet", "--", PARTITION_DIR], timeout=STEP_TIMEOUTS["add"])
+        if staged not in (0, 1): return self.stop_after("Git Diff", staged)  # 1 = Änderungen vorgemerkt
+        if staged == 0:
+            # Nichts Neues vorgemerkt: kein Fehler; der Push nimmt ggf. einen liegengebliebenen Commit mit
+            self.log("ℹ️ Nichts zu committen – die Snapshots entsprechen schon dem Repo.")
+        else:
+            code = self.git_cmd(["git", "commit", "-m", f"Auto-Update Listen-Snapshots ({len(changed) - 1} Partitionen)"],
+                                "Git Commit (Bestätigen)", "commit")
+            if code != 0: return self.stop_after("Git Commit", code)
+
+        code = self.git_cmd(["git", "push", "--progress"], "Git Push (Hochladen)", "push")
 
-        # Git Workflow
-        self.git_cmd(["git", "pull"], "Git Pull (Aktualisieren)")
-        self.git_cmd(["git", "add", "."], "Git Add (Vorbereiten)")
-        self.git_cmd(["git", "commit", "-m", "Auto-Update Excel Lists"], "Git Commit (Bestätigen)")
-        
-        code = self.git_cmd(["git", "push"], "Git Push (Hochladen)")
-        
         if code == 0:
             self.log("\n✅ ERFOLGREICH! Daten sind online.")
-            self.lbl_status.config(text="Upload fertig!", fg="green")
+            self.set_status("Upload fertig!", "green")
+        elif code is None:
+            self.log("\n⚠️ Push nicht abgeschlossen – der Commit ist lokal und geht beim nächsten Lauf mit hoch.")
+            self.set_status("Abgebrochen.", "orange")
         else:
             self.log("\n⚠️ Warnung: Push hatte Probleme (oder nichts Neues).")
-            self.lbl_status.config(text="Fertig (mit Hinweisen)", fg="orange")
-            
-        self.btn_start.config(state="normal")
+            self.set_status("Fertig (mit Hinweisen)", "orange")
+
+    def stop_after(self, step, code):
+        """Beendet den Ablauf nach einem gescheiterten (code != 0) oder abgebrochenen (None) Schritt."""
+        if code is None:
+            self.set_status("Abgebrochen.", "orange")
+            return
+        self.log(f"\n❌ {step} fehlgeschlagen (Exit-Code {code}) – es wird nichts hochgeladen.")
+        self.set_status(f"Fehler bei {step}", "red")
 
     def start_update_thread(self):
-        self.btn_start.config(state="disabled")
-        self.lbl_status.config(text="Arbeite...", fg="blue")
+        self.cancel_event.clear()
+        self.set_running(True)
+        self.set_status("Arbeite...", "blue")
         threading.Thread(target=self.run_process, daemon=True).start()
 
+    def cancel(self):
+        self.cancel_event.set()
+        self.set_status("Breche ab...", "orange")
+
 if __name__ == "__main__":
     root = tk.Tk()
     GitUploaderApp(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
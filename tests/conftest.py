@@ -0,0 +1,6 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Module liegen im Repo-Ordner, die Stellvertreter (fakes.py) teilen sich Tests und Benchmarks
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
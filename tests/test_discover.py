@@ -0,0 +1,50 @@
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from couchpilot_tmdb import DiscoverStream
+
+PER_PAGE = 20
+
+class CountingTmdb:
+    """discover-Seiten mit fortlaufenden IDs; zählt Seitenabrufe und angereicherte Titel."""
+
+    def __init__(self, total_pages=10):
+        self.total_pages = total_pages
+        self.pages = []
+        self.enriched = []
+        self._lock = threading.Lock()
+
+    def fetch(self, url):
+        page = int(re.search(r"&page=(\d+)", url).group(1))
+        with self._lock: self.pages.append(page)
+        start = (page - 1) * PER_PAGE
+        return {"total_pages": self.total_pages, "results": [{"id": i, "title": f"Titel {i}"} for i in range(start, start + PER_PAGE)]}
+
+    def enrich(self, items):
+        with self._lock: self.enriched.extend(m["id"] for m in items)
+        for m in items: m["credits"] = {"cast": []}
+
+def test_next_batch_enriches_only_the_shown_slice():
+    tmdb = CountingTmdb()
+    stream = DiscoverStream("https://tmdb/discover/movie?x=1", tmdb.fetch, tmdb.enrich)
+    exclude = frozenset(str(i) for i in range(0, 10))
+    batch = stream.next_batch(exclude)
+    assert [m["id"] for m in batch] == list(range(10, 25))
+    assert sorted(tmdb.enriched) == list(range(10, 25))
+    assert not set(tmdb.enriched) & {int(i) for i in exclude}
+    assert all("credits" in m for m in batch)
+
+def test_prefetch_stages_the_next_slice():
+    tmdb = CountingTmdb()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        stream = DiscoverStream("https://tmdb/discover/movie?x=1", tmdb.fetch, tmdb.enrich, pool)
+        first = stream.next_batch()
+        stream.prefetch()
+        stream._pending.result()
+        assert len(tmdb.enriched) == 30
+        second = stream.next_batch()
+    assert len(tmdb.enriched) == 30  # schon beim Vorladen angereichert
+    assert [m["id"] for m in first + second] == list(range(30))
+    assert all("credits" in m for m in second)
+    assert sorted(tmdb.enriched) == list(range(30))
@@ -0,0 +1,55 @@
+import json
+import os
+
+import pytest
+
+from couchpilot_library import (MANIFEST_PATH, SnapshotStore, export_partitions, load_library, load_partitioned,
+                                new_manifest)
+from fakes import LIBRARY_FILES, LibraryFileServer
+
+ROWS = 300
+EXPORTED = ["Filme_Rosi_2025_DE.xlsx", "Serien_Rosi_2025.xlsx"]  # wie FILES_TO_SYNC in gui_upload.py
+
+@pytest.fixture(scope="module")
+def server(tmp_path_factory):
+    # Manifest nur für zwei der drei Mappen, Kairo gibt es nur als Excel
+    srv = LibraryFileServer(cache_dir=str(tmp_path_factory.mktemp("workbooks")), latency=0).start()
+    srv.prepare(ROWS)
+    repo, manifest = str(tmp_path_factory.mktemp("repo")), new_manifest()
+    for name in EXPORTED:
+        written, _ = export_partitions(srv.content(ROWS, name), name, repo, manifest)
+        for rel in written:
+            with open(os.path.join(repo, rel), "rb") as f: srv.publish(ROWS, rel, f.read())
+    srv.publish(ROWS, MANIFEST_PATH, json.dumps(manifest).encode("utf-8"))
+    yield srv
+    srv.stop()
+
+def urls(server):
+    return [server.base_url(ROWS) + name for name in LIBRARY_FILES]
+
+def sources(library):
+    return {r["url"].rsplit("/", 1)[-1]: r["source"] for r in library.load_report}
+
+def test_workbooks_missing_from_manifest_are_loaded_directly(server, tmp_path):
+    store = SnapshotStore(str(tmp_path / "store"))
+    library = load_partitioned(server.base_url(ROWS) + MANIFEST_PATH, urls(server), store=store)
+    expected = load_library(urls(server))
+    assert [r["error"] for r in library.load_report] == [None, None, None]
+    assert sources(library)["Filme_Rosi_2025_Kairo.xlsx"] == "download"
+    assert all(sources(library)[name].startswith("delta") for name in EXPORTED)
+    assert len(library) == len(expected)
+    assert library.df.equals(expected.df)
+
+def test_stale_manifest_is_reported(server, tmp_path):
+    store = SnapshotStore(str(tmp_path / "store"))
+    manifest_url = server.base_url(ROWS) + MANIFEST_PATH
+    fresh = load_partitioned(manifest_url, urls(server), store=store)
+    content = server.content(ROWS, MANIFEST_PATH)
+    server.unpublish(ROWS, MANIFEST_PATH)
+    try:
+        stale = load_partitioned(manifest_url, urls(server), store=store)
+    finally:
+        server.publish(ROWS, MANIFEST_PATH, content)
+    assert {name: sources(stale)[name] for name in EXPORTED} == {name: "veraltet" for name in EXPORTED}
+    assert sources(stale)["Filme_Rosi_2025_Kairo.xlsx"] == "snapshot"
+    assert stale.df.equals(fresh.df)
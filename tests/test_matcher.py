@@ -0,0 +1,51 @@
+import random
+
+from rapidfuzz import fuzz
+
+from couchpilot_library import LibraryMatcher, normalize_title
+
+WORDS = ["nacht", "stadt", "mord", "liebe", "berlin", "agent", "krieg", "hund", "doktor", "familie",
+         "schwarz", "sommer", "winter", "könig", "der", "die", "das", "letzte", "große", "weg"]
+
+def make_library(n, seed=1):
+    rng = random.Random(seed)
+    titles = {" ".join(rng.sample(WORDS, rng.randint(2, 4))).title() + f" {i % 97}" for i in range(n)}
+    return {t: {"title": t, "i": i} for i, t in enumerate(sorted(titles))}
+
+def reference_match(matcher, title):
+    # Jeder Titel einzeln gegen seine eigene Kandidatenliste, ohne rapidfuzz.process
+    norm = normalize_title(title)
+    if not norm: return None
+    if str(title).strip().lower() in matcher.library: return matcher.library[str(title).strip().lower()]
+    if norm in matcher.exact: return matcher.library[matcher.exact[norm]]
+    best, best_score = None, matcher.score_cutoff
+    for i in sorted(matcher.candidates(norm)):
+        score = fuzz.WRatio(norm, matcher.norm_keys[i])
+        if score > best_score or (best is None and score >= best_score): best, best_score = i, score
+    return None if best is None else matcher.library[matcher.orig_keys[best]]
+
+def test_match_many_equals_single_matches():
+    library = make_library(3000)
+    matcher = LibraryMatcher(library)
+    rng = random.Random(7)
+    titles = [t.lower().replace(" ", "  ") for t in rng.sample(list(library), 40)]
+    titles += [t[:-1] + "x" for t in rng.sample(list(library), 40)]
+    titles += ["Völlig Unbekannt", "", "Der Weg"]
+    batched = matcher.match_many(titles)
+    assert batched == [matcher.match(t) for t in titles]
+    assert batched == [reference_match(matcher, t) for t in titles]
+    assert sum(r is not None for r in batched) >= 40
+
+def test_exact_and_miss():
+    library = {"Der Pate (1972)": {"title": "Der Pate"}}
+    matcher = LibraryMatcher(library)
+    assert matcher.match_many(["Pate, Der", "Irgendwas ganz anderes", None]) == [{"title": "Der Pate"}, None, None]
+
+def test_literal_title_wins_over_normalized_collision():
+    # Bibliotheksschlüssel sind die klein geschriebenen Titel; die erste Zeile besetzt den normalisierten Schlüssel
+    library = {t.lower(): {"title": t} for t in ["Hospital", "The Hospital", "Hard", "Die Hard",
+                                                    "Insomnia - Schlaflos", "Insomnia – Schlaflos"]}
+    matcher = LibraryMatcher(library)
+    titles = ["The Hospital", "Die Hard", "Insomnia – Schlaflos", "Hospital", "Hard", "Der Hospital"]
+    assert [r["title"] for r in matcher.match_many(titles)] == ["The Hospital", "Die Hard", "Insomnia – Schlaflos",
+                                                                 "Hospital", "Hard", "Hospital"]
@@ -0,0 +1,57 @@
+import pytest
+import requests
+
+from couchpilot_db import DB_COLUMNS, GspreadSheet, SheetDB
+from fakes import MemoryWorksheet, sheet_rows
+
+def make_db(rows):
+    ws = MemoryWorksheet(rows)
+    return ws, SheetDB(GspreadSheet(ws))
+
+def record(ws, m_id):
+    rows = [dict(zip(ws.rows[0], r)) for r in ws.rows[1:]]
+    return [r for r in rows if r["id"] == m_id]
+
+def test_status_change_is_written_incrementally():
+    ws, db = make_db(sheet_rows(50))
+    assert db.apply({"id": "20000007"}, "seen", user_rating=8) == "incremental"
+    assert record(ws, "20000007")[0]["status"] == "seen"
+    assert record(ws, "20000007")[0]["user_rating"] == 8.0
+    assert len(ws.rows) == 51
+    assert ws.method_calls["clear"] == ws.method_calls["update"] == 0
+
+def test_append_and_delete():
+    ws, db = make_db(sheet_rows(10))
+    assert db.apply({"id": 42, "title": "Neu"}, "watchlist", "Suche") == "incremental"
+    assert record(ws, "42")[0]["source"] == "Suche"
+    assert db.apply({"id": "20000003"}, "delete") == "incremental"
+    assert db.apply({"id": "42"}, "seen") == "incremental"
+    assert record(ws, "20000003") == []
+    assert record(ws, "42")[0]["status"] == "seen"
+    assert len(ws.rows) == 11
+
+def test_external_edit_rebuilds_index():
+    ws, db = make_db(sheet_rows(10))
+    db.refresh()
+    ws.rows.insert(1, ["99", "Von Hand"] + [""] * (len(DB_COLUMNS) - 2))
+    assert db.apply({"id": "20000002"}, "seen") == "incremental"
+    assert record(ws, "20000002")[0]["status"] == "seen"
+    assert record(ws, "99")[0]["status"] == ""
+
+def test_missing_columns_fall_back_to_rewrite():
+    ws, db = make_db([["id", "title", "status"], ["1", "Alt", "watchlist"]])
+    assert db.apply({"id": "1"}, "seen") == "rewrite"
+    assert ws.method_calls["clear"] == 1
+    assert record(ws, "1")[0]["status"] == "seen"
+
+def test_transient_error_is_raised_without_rewrite():
+    ws, db = make_db(sheet_rows(20))
+    before = [list(r) for r in ws.rows]
+    ws.failures["batch_update"] = requests.ConnectionError("Connection reset by peer")
+    with pytest.raises(requests.ConnectionError):
+        db.apply({"id": "20000005"}, "seen")
+    assert ws.rows == before
+    assert ws.method_calls["clear"] == 0
+    # Der nächste Versuch (SheetSync) klappt wieder zeilenweise
+    assert db.apply({"id": "20000005"}, "seen") == "incremental"
+    assert record(ws, "20000005")[0]["status"] == "seen"
@@ -0,0 +1,43 @@
+import sqlite3
+import time
+
+from couchpilot_db import GspreadSheet, LocalStore, SheetDB, SheetSync
+from fakes import MemoryWorksheet, sheet_rows
+
+def wait_for(condition, timeout=5.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        if condition(): return True
+        time.sleep(0.02)
+    return False
+
+def test_failing_push_does_not_stop_the_sync_thread(tmp_path, monkeypatch):
+    store = LocalStore(str(tmp_path / "watchlist.sqlite"))
+    ws = MemoryWorksheet(sheet_rows(5))
+    sync = SheetSync(store, SheetDB(GspreadSheet(ws)), push_delay=0.01, pull_interval=3600, retry_delay=0.05)
+    sync.sync()
+
+    mark_pushed, errors = store.mark_pushed, []
+    def failing_mark_pushed(*args):
+        if not errors:
+            errors.append(1)
+            raise sqlite3.OperationalError("database is locked")
+        return mark_pushed(*args)
+    monkeypatch.setattr(store, "mark_pushed", failing_mark_pushed)
+
+    sync.start()
+    store.apply({"id": 77, "title": "Neu"}, "watchlist", "Test")
+    sync.trigger()
+    assert wait_for(lambda: errors and not store.dirty())
+    assert sync._thread.is_alive()
+    assert [r[1] for r in ws.rows if r[0] == "77"] == ["Neu"]
+
+def test_loop_error_is_recorded(tmp_path, monkeypatch):
+    store = LocalStore(str(tmp_path / "watchlist.sqlite"))
+    sync = SheetSync(store, SheetDB(GspreadSheet(MemoryWorksheet(sheet_rows(1)))), pull_interval=3600, retry_delay=10)
+    sync._pull_due = time.time() + 3600
+    monkeypatch.setattr(store, "dirty", lambda: (_ for _ in ()).throw(sqlite3.OperationalError("disk I/O error")))
+    sync.start().trigger(delay=0)
+    assert wait_for(lambda: sync.last_error is not None)
+    assert sync.last_error == "OperationalError: disk I/O error"
+    assert sync._thread.is_alive()